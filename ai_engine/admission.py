@@ -0,0 +1,143 @@
+"""
+Admission control for the AI engine.
+
+Each worker process runs a few bounded pools (default, reports, pdf). A
+pool lets `max_active` requests run at once and up to `max_queued` more
+wait for a slot, for at most `queue_timeout` seconds. Anything beyond that
+is turned away immediately instead of piling up behind the slow requests:
+
+  429  the pool's wait queue is full
+  503  a queued request waited `queue_timeout` seconds without a slot
+
+Both carry a Retry-After header estimated from the pool's recent service
+times and current queue length. Expensive routes (report rendering, PDF
+parsing) get pools of their own so a burst of them cannot starve the
+cheap analysis routes. Health, metrics and status routes are never
+queued. Queue depths are reported at /admission/stats and in /metrics.
+
+Limits only matter when a worker serves several requests at once, i.e.
+with gunicorn's threaded workers (see gunicorn.conf.py).
+"""
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from metrics import count_rejection, observe_admission
+
+
+class Overloaded(Exception):
+    """Raised when a pool cannot admit a request."""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Pool:
+    """A concurrency limit with a bounded, time-limited wait queue."""
+
+    def __init__(self, name, max_active, max_queued, queue_timeout):
+        self.name = name
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.service_time = 0.1  # moving average of seconds per request
+        self._cond = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until a new request would likely get a slot (at least 1)."""
+        backlog = (self.active + self.queued + 1) / max(self.max_active, 1)
+        return max(1, math.ceil(backlog * self.service_time))
+
+    def _reject(self, message, status):
+        self.rejected += 1
+        count_rejection(self.name, status)
+        raise Overloaded(message, status, self.retry_after())
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.max_active and self.queued == 0:
+                self.active += 1
+            else:
+                if self.queued >= self.max_queued:
+                    self._reject(f"The '{self.name}' pool is full, retry later", 429)
+                self.queued += 1
+                observe_admission(self.name, self.active, self.queued)
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self.active >= self.max_active:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject(f"Timed out waiting in the '{self.name}' pool", 503)
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+                self.active += 1
+            self.admitted += 1
+            observe_admission(self.name, self.active, self.queued)
+        return time.monotonic()
+
+    def release(self, started):
+        with self._cond:
+            self.active -= 1
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - started)
+            observe_admission(self.name, self.active, self.queued)
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'queued': self.queued,
+            'max_active': self.max_active,
+            'max_queued': self.max_queued,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'avg_service_ms': round(self.service_time * 1000, 1),
+        }
+
+
+class AdmissionControl:
+    """
+    Routes each request (by endpoint name) to a pool. `route_pools` maps
+    endpoints to pool names, `exempt` lists endpoints that bypass
+    admission, and every other endpoint uses the 'default' pool.
+    """
+
+    def __init__(self, pools, route_pools=None, exempt=()):
+        self.pools = {pool.name: pool for pool in pools}
+        self.route_pools = route_pools or {}
+        self.exempt = set(exempt)
+
+    def _before_request(self):
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in self.exempt or request.method == 'OPTIONS':
+            return None
+        pool = self.pools[self.route_pools.get(endpoint, 'default')]
+        try:
+            started = pool.acquire()
+        except Overloaded as e:
+            response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, e.status
+        g.admission = (pool, started)
+        return None
+
+    def _teardown_request(self, error=None):
+        admitted = g.pop('admission', None)
+        if admitted is not None:
+            pool, started = admitted
+            pool.release(started)
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def install(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
@@ -0,0 +1,129 @@
+"""
+Rolling statistics and anomaly flags for the /anomalies route.
+
+For every point of a series, over the `window` points just before it:
+
+    mean, std   rolling mean and sample standard deviation
+    z           (value - mean) / std
+    ewma        exponentially weighted moving average (weight `alpha` on
+                the newest point), over the whole series up to and
+                including the point
+
+A point is an anomaly when |z| >= threshold. The first `window` points of
+each series have no full window and are never flagged.
+
+All series are packed end to end into one flat array (trend.pack_series)
+and every window's sums come from cumulative sums, so a window costs the
+same whatever its length and all categories are done in the same pass.
+The cumulative sums restart every block of points, over just the points
+the windows of that block need, centered on their own mean: rounding
+then scales with the local spread of the data instead of its level or
+its length, so a series far from zero or stepping between levels keeps
+exact-enough window variances. A window is flat when no value in it
+differs from the one before, counted exactly with integers. EWMA is a
+first-order recursive filter, run with scipy.signal.lfilter per series.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from trend import pack_series
+
+DEFAULT_WINDOW = 20
+DEFAULT_THRESHOLD = 3.0
+DEFAULT_ALPHA = 0.3
+# Points per block of cumulative sums in rolling_stats (at least the window)
+BLOCK_POINTS = 128
+
+
+class RollingStats(NamedTuple):
+    # One entry per packed point; NaN where the window is not full yet
+    mean: np.ndarray
+    std: np.ndarray
+    z: np.ndarray
+    ewma: np.ndarray
+
+
+def ewma(values, alpha):
+    """Exponentially weighted moving average, starting from the first value."""
+    from scipy.signal import lfilter  # imported on first use to keep startup fast
+
+    y = np.asarray(values, dtype=float)
+    if y.shape[0] == 0:
+        return y.copy()
+    smoothed, _ = lfilter([alpha], [1.0, alpha - 1.0], y, zi=[(1.0 - alpha) * y[0]])
+    return smoothed
+
+
+def rolling_stats(series, window, alpha=DEFAULT_ALPHA):
+    """
+    Rolling mean / std / z-score over the previous `window` points and the
+    EWMA of every point of every series in `series` (a list of non-empty
+    1-D value sequences or a PackedSeries). Returns flat arrays aligned
+    with pack_series(series).values.
+    """
+    y, lengths, starts = pack_series(series)
+    if y.shape[0] == 0:
+        empty = np.empty(0)
+        return RollingStats(empty, empty, empty, empty)
+
+    n = y.shape[0]
+    # Per-series centering first, so rows spanning two series are not far apart
+    centers = np.repeat(np.add.reduceat(y, starts) / lengths, lengths)
+    centered = y - centers
+    block = max(window, BLOCK_POINTS)
+    blocks = -(-n // block)
+    # Row b holds the points the windows of block b cover: the `window`
+    # points before it and the block itself, centered on the row's mean
+    positions = np.arange(-window, block)[None, :] + (np.arange(blocks) * block)[:, None]
+    inside = (positions >= 0) & (positions < n)
+    rows = centered[np.clip(positions, 0, n - 1)]
+    reference = np.where(inside, rows, 0.0).sum(axis=1) / inside.sum(axis=1)
+    rows = np.where(inside, rows - reference[:, None], 0.0)
+
+    # Window of point b * block + j: row positions j .. j + window - 1
+    sums = np.cumsum(np.pad(rows, ((0, 0), (1, 0))), axis=1)
+    squares = np.cumsum(np.pad(rows * rows, ((0, 0), (1, 0))), axis=1)
+    window_sum = (sums[:, window:window + block] - sums[:, :block]).ravel()[:n]
+    window_sq = (squares[:, window:window + block] - squares[:, :block]).ravel()[:n]
+    local = np.repeat(reference, block)[:n]
+    offset = centered - local
+
+    t = np.arange(n)
+    full = (t - np.repeat(starts, lengths)) >= window
+    # Number of points so far that differ from the one before them
+    changes = np.concatenate(([0], np.cumsum(y[1:] != y[:-1])))
+    lo = np.maximum(t - window, 0)
+    flat = full & (changes[np.maximum(t - 1, 0)] == changes[lo])
+
+    window_mean = window_sum / window
+    spread = np.maximum(window_sq - window_sum * window_mean, 0.0)
+    spread[flat] = 0.0
+    std = np.where(full, np.sqrt(spread / (window - 1)), np.nan)
+    mean = np.where(full, centers + (local + window_mean), np.nan)
+    deviation = offset - window_mean
+    # A flat window equals the point just before t: compare with it exactly
+    previous = np.concatenate(([y[0]], y[:-1]))
+    mean[flat] = previous[flat]
+    deviation[flat] = y[flat] - previous[flat]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A flat window makes any change infinitely unusual, and no change not at all
+        z = np.where(std > 0, deviation / std, np.where(deviation == 0, 0.0, np.sign(deviation) * np.inf))
+    z[~full] = np.nan
+
+    smoothed = np.empty_like(y)
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        smoothed[start:start + length] = ewma(y[start:start + length], alpha)
+
+    return RollingStats(mean, std, z, smoothed)
+
+
+def flag_anomalies(stats, threshold, starts):
+    """
+    Returns (points, series) for every point with |z| >= threshold, in
+    packed order: `points` are flat indices, `series` the index of the
+    series each belongs to.
+    """
+    with np.errstate(invalid='ignore'):
+        points = np.flatnonzero(np.abs(stats.z) >= threshold)
+    return points, np.searchsorted(starts, points, side='right') - 1
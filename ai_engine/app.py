@@ -1,17 +1,35 @@
 from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
-from sklearn.linear_model import LinearRegression
 import numpy as np
-import pandas as pd
+import importlib
 import io
 import os
-from pypdf import PdfReader
-from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import re
+import threading
+
+from admission import AdmissionControl, Overloaded, Pool
+from anomalies import DEFAULT_ALPHA, DEFAULT_THRESHOLD, DEFAULT_WINDOW, flag_anomalies, rolling_stats
+from column_store import ColumnStore
+from correlation import lagged_stats, pairwise_stats, top_pairs
+from downsample import DEFAULT_POINTS, downsample_indices
+from file_parser import ExtractionTimeout, FileTooLarge, parse_file_content
+from model_registry import ModelRegistry, validate_model_key
+from metrics import install_metrics, metrics_response, observe_series_lengths, stage
+from payloads import as_values, install_json_provider, request_body, respond, series_values
+from reports import ReportJobs, render_report, report_id
+from result_cache import cached, create_cache
+from series_store import SeriesStore, state_fit, state_ss_res, states_to_arrays
+from smoothing import SmoothingFit, fit_smoothing, simulate_smoothing, smoothing_forecast
+from snapshots import SnapshotStore, category_hash
+from trend import (
+    SeriesStats, TrendFits, fit_trend, fit_trends, forecast, forecast_many, pack_series, series_stats,
+    simulate_forecasts, trend_residuals, unpack_fits
+)
 
 app = Flask(__name__)
+# orjson-backed jsonify / get_json when installed
+install_json_provider(app)
+# Request / stage timings for /metrics
+install_metrics(app)
 # Configure CORS
 cols_origin = os.environ.get('CORS_ORIGIN', '*')
 CORS(app, resources={r"/*": {"origins": cols_origin}})
@@ -20,128 +38,511 @@ CORS(app, resources={r"/*": {"origins": cols_origin}})
 MODELS_DIR = os.path.join(os.getcwd(), 'models')
 os.makedirs(MODELS_DIR, exist_ok=True)
 
-def parse_file_content(file_stream, filename):
+# Upload limits for /predict-from-file
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+MAX_UPLOAD_POINTS = int(os.environ.get('MAX_UPLOAD_POINTS', 5_000_000))
+
+# Result cache for the analysis routes (see result_cache.py).
+# Point RESULT_CACHE_DIR at /dev/shm to keep the shared file store in memory.
+result_cache = create_cache(
+    os.environ.get('RESULT_CACHE_BACKEND', 'memory'),
+    max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1024)),
+    ttl=float(os.environ.get('RESULT_CACHE_TTL', 300)),
+    directory=os.environ.get('RESULT_CACHE_DIR', os.path.join(MODELS_DIR, 'cache')),
+    redis_url=os.environ.get('RESULT_CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0'),
+)
+
+# Running per-series statistics for incremental forecasting (see series_store.py)
+series_store = SeriesStore(os.path.join(MODELS_DIR, 'series'))
+# Raw points of stored series, memory-mapped (see column_store.py)
+column_store = ColumnStore(os.path.join(MODELS_DIR, 'columns'))
+# Versioned fitted models per model key, e.g. "<user>:<category>" (see model_registry.py)
+model_registry = ModelRegistry(
+    os.path.join(MODELS_DIR, 'registry'),
+    max_hot=int(os.environ.get('MODEL_REGISTRY_MAX_HOT', 256)),
+    max_versions=int(os.environ.get('MODEL_REGISTRY_MAX_VERSIONS', 20)),
+)
+# Precomputed dashboard snapshots per tenant (see snapshots.py)
+snapshot_store = SnapshotStore(
+    os.path.join(MODELS_DIR, 'snapshots'),
+    max_versions=int(os.environ.get('SNAPSHOT_MAX_VERSIONS', 10)),
+)
+# Background PDF rendering (see reports.py); finished reports are kept on disk
+report_jobs = ReportJobs(
+    os.environ.get('REPORTS_DIR', os.path.join(MODELS_DIR, 'reports')),
+    pool_size=int(os.environ.get('REPORT_POOL_SIZE', 2)),
+    timeout=float(os.environ.get('REPORT_TIMEOUT_SECONDS', 300)),
+    max_queued=int(os.environ.get('REPORT_MAX_QUEUED', 32)),
+)
+
+# Per-worker admission control (see admission.py): concurrent requests and
+# wait queue per pool, with reports and PDF uploads kept apart from the rest.
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+admission = AdmissionControl(
+    [
+        Pool('default', int(os.environ.get('ADMISSION_MAX_ACTIVE', 4)),
+             int(os.environ.get('ADMISSION_MAX_QUEUED', 16)), ADMISSION_QUEUE_TIMEOUT),
+        Pool('reports', int(os.environ.get('ADMISSION_REPORTS_MAX_ACTIVE', 1)),
+             int(os.environ.get('ADMISSION_REPORTS_MAX_QUEUED', 4)), ADMISSION_QUEUE_TIMEOUT),
+        Pool('pdf', int(os.environ.get('ADMISSION_PDF_MAX_ACTIVE', 2)),
+             int(os.environ.get('ADMISSION_PDF_MAX_QUEUED', 4)), ADMISSION_QUEUE_TIMEOUT),
+    ],
+    route_pools={'generate_report': 'reports', 'predict_from_file': 'pdf'},
+    exempt=('root', 'health', 'metrics', 'cache_stats', 'admission_stats',
+            'report_status', 'download_report', 'static'),
+)
+admission.install(app)
+
+# PDF parsing / rendering libraries, joblib and scipy.signal are imported on first use (see
+# file_parser.py, reports.py, model_registry.py, smoothing.py) so a cold worker can answer /health at once.
+HEAVY_MODULES = ('pypdf', 'reportlab.pdfgen.canvas', 'reportlab.pdfbase.pdfmetrics', 'joblib', 'scipy.signal')
+
+def preload_heavy_modules():
     """
-    Parses PDF or TXT content to extract numerical data points.
-    Expected format: one number per line OR date,number pairs.
-    Returns a list of dictionaries: [{'label': 'Entry 1', 'value': 123.4}, ...]
+    Imports the lazily loaded libraries. gunicorn.conf.py calls this in the
+    master so that forked workers start with them already in memory.
     """
-    text = ""
-    try:
-        if filename.lower().endswith('.pdf'):
-            reader = PdfReader(file_stream)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        else:
-            # Assume text based
-            text = file_stream.read().decode('utf-8')
-    except Exception as e:
-        raise ValueError(f"Failed to parse file: {str(e)}")
-
-    # Extract all numbers from the text
-    # Strategy: look for lines with numbers.
-    # Simple regex to find numbers (int or float)
-    # If a line has a date and a number, use the date as label?
-    # For MVP: just extract all numbers found in sequence.
-    
-    data_points = []
-    lines = text.split('\n')
-    counter = 1
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Regex to find the last number in the line (assuming "Date: Value" format)
-        # Matches 123, 123.45, -123.45
-        matches = re.findall(r'[-+]?\d*\.\d+|\d+', line)
-        if matches:
-            # Take the last number as the value
-            try:
-                val = float(matches[-1])
-                # Try to find a label (everything before the number)
-                # Or just use "Entry X"
-                label = f"Entry {counter}"
-                
-                # If the line starts with something that looks like a date/label
-                # (simple heuristic: first part of line)
-                parts = line.split()
-                if len(parts) > 1:
-                    # Join parts except the last one (which is likely the value)
-                    possible_label = " ".join(parts[:-1]).strip()
-                    # Clean up label (remove trailing colon etc)
-                    possible_label = possible_label.rstrip(':,')
-                    if len(possible_label) < 30: # Reasonable label length
-                        label = possible_label
-                
-                data_points.append({'label': label, 'value': val})
-                counter += 1
-            except ValueError:
-                continue
-                
-    if not data_points:
-        raise ValueError("No valid numerical data found in file")
-        
-    return data_points
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+def warm_up_in_background():
+    """Loads the heavy libraries on a daemon thread while requests are served."""
+    threading.Thread(target=preload_heavy_modules, name='warm-up', daemon=True).start()
+
+def requested_season_length(body):
+    """
+    Picks the forecast engine from body['model']: 'linear' (the default
+    least-squares trend) gives None; exponential smoothing gives its season
+    length, 1 for 'holt' and body['season_length'] (default 12) for
+    'holt_winters'.
+    """
+    model = body.get('model', 'linear')
+    if model == 'linear':
+        return None
+    if model == 'holt':
+        return 1
+    if model == 'holt_winters':
+        season_length = int(body.get('season_length', 12))
+        if season_length < 2:
+            raise ValueError('season_length must be at least 2 for holt_winters')
+        return season_length
+    raise ValueError(f"Unknown model: {model!r} (expected 'linear', 'holt' or 'holt_winters')")
+
+
+def forecast_values(fit, horizon):
+    """Forecasts the next `horizon` values from a TrendFit or a SmoothingFit."""
+    if isinstance(fit, SmoothingFit):
+        return smoothing_forecast(fit, np.arange(1, horizon + 1))
+    return forecast(fit, horizon)
+
+
+def model_info(fit):
+    """The 'model' block of a response: engine, accuracy (R², in %) and its parameters."""
+    if isinstance(fit, SmoothingFit):
+        info = {
+            'type': 'Holt-Winters' if fit.season_length > 1 else 'Holt',
+            'accuracy': round(fit.r2 * 100, 2),
+            'slope': round(fit.trend, 2),
+            'level': round(fit.level, 2),
+            'alpha': fit.alpha,
+            'beta': fit.beta,
+        }
+        if fit.season_length > 1:
+            info.update(gamma=fit.gamma, season_length=fit.season_length)
+        return info
+    return {
+        'type': 'Linear Regression',
+        'accuracy': round(fit.r2 * 100, 2),
+        'slope': round(fit.slope, 2),
+        'intercept': round(fit.intercept, 2)
+    }
+
+
+def prediction_result(fit, predictions, version=None):
+    """
+    Builds the /predict response body for a fitted model and its forecasts.
+    `version` is the model registry version, when the fit was stored.
+    """
+    result = {
+        'predictions': [
+            {
+                'label': f'Prediction {i + 1}',
+                'value': round(float(pred), 2),
+                'index': fit.n + i
+            }
+            for i, pred in enumerate(predictions)
+        ],
+        'model': model_info(fit)
+    }
+    if version is not None:
+        result['model']['version'] = version
+    return result
+
+
+def fit_values(values, model_key=None, season_length=None):
+    """
+    Fits a trend to `values`, or exponential smoothing when a season length
+    is given (see requested_season_length). With a model key the fit goes
+    through the model registry, which stores it as a new version or, for
+    data the latest version was fitted on, returns that version without
+    refitting. Returns (fit, version); version is None without a key.
+    """
+    if season_length is not None:
+        if model_key is None:
+            return fit_smoothing(values, season_length), None
+        return model_registry.fit_smoothing(model_key, values, season_length)
+    if model_key is None:
+        return fit_trend(values), None
+    return model_registry.fit_trend(model_key, values)
+
+
+SERIES_RANGE_KEYS = ('start', 'stop', 'from', 'to')
+
+
+def downsampled_points(values, options, labels=None):
+    """
+    Reduces a series to a chart-sized list of {'index', 'value'(, 'label')}
+    points (see downsample.py). `options` is a target point count or
+    {'points': ..., 'method': 'lttb' | 'minmax'}; `labels`, when known,
+    are picked for the kept points.
+    """
+    if not isinstance(options, dict):
+        options = {'points': options}
+    indices = downsample_indices(values, options.get('points', DEFAULT_POINTS), options.get('method', 'lttb'))
+    kept = np.asarray(values, dtype=float)[indices]
+    points = [{'index': i, 'value': round(v, 2)} for i, v in zip(indices.tolist(), kept.tolist())]
+    if labels is not None and len(labels) == len(values):
+        for point in points:
+            point['label'] = labels[point['index']]
+    return points
+
+
+def series_labels(body):
+    """Labels sent with a series, columnar or as {'value', 'label'} dicts; None if there are none."""
+    if 'labels' in body:
+        return body['labels']
+    data = body.get('data')
+    if isinstance(data, list) and data and isinstance(data[0], dict) and 'label' in data[0]:
+        return [point.get('label') for point in data]
+    return None
+
+
+def history_block(body, values):
+    """
+    The downsampled 'history' of the analysed series that /predict and
+    /simulate add when asked with "downsample": <points> (or
+    {"points": ..., "method": ...}). Stored series are read from the column store.
+    """
+    if values is None:
+        values = column_store.values(
+            body['series_id'], body.get('start'), body.get('stop'), body.get('from'), body.get('to')
+        )
+    return downsampled_points(values, body['downsample'], series_labels(body))
+
+
+def stored_series_fit(body, season_length=None):
+    """
+    Fits the stored series named by body['series_id']. The whole history is
+    answered from its running statistics in O(1); when a range is given
+    (start / stop indices and/or from / to dates) the trend is fitted on a
+    zero-copy view of just those points.
+
+    Exponential smoothing (with a season length) runs over the raw points.
+    For the whole history its state is kept in the model registry under
+    "series:<series_id>", so points appended since are folded in without
+    going over the rest again.
+
+    Returns (fit, None), or (None, error response) if it cannot be fitted.
+    """
+    series_id = body['series_id']
+    if season_length is not None:
+        ranged = any(body.get(key) is not None for key in SERIES_RANGE_KEYS)
+        values = column_store.values(
+            series_id, body.get('start'), body.get('stop'), body.get('from'), body.get('to')
+        )
+        if values is None:
+            return None, (jsonify({'error': f'Unknown series: {series_id}'}), 404)
+        if len(values) < 2:
+            return None, (jsonify({'error': 'Need at least 2 data points to make a prediction'}), 400)
+        fit, _ = fit_values(values, None if ranged else f'series:{series_id}', season_length)
+        return fit, None
+
+    if any(body.get(key) is not None for key in SERIES_RANGE_KEYS):
+        values = column_store.values(
+            series_id, body.get('start'), body.get('stop'), body.get('from'), body.get('to')
+        )
+        if values is None:
+            return None, (jsonify({'error': f'Unknown series: {series_id}'}), 404)
+        if len(values) < 2:
+            return None, (jsonify({'error': 'Need at least 2 data points in range'}), 400)
+        return fit_trend(values), None
+
+    state = series_store.get(series_id)
+    if state is None:
+        return None, (jsonify({'error': f'Unknown series: {series_id}'}), 404)
+    if state['n'] < 2:
+        return None, (jsonify({'error': 'Need at least 2 data points to make a prediction'}), 400)
+    return state_fit(state), None
 
 
 @app.route('/predict', methods=['POST'])
+@cached(result_cache, 'predict', uncached_keys=('series_id', 'model_key'))
 def predict():
     """
     Receives an array of data points and predicts the next 3 future values
-    using Linear Regression.
+    using Linear Regression, or exponential smoothing with "model": "holt"
+    or "holt_winters" (plus "season_length", see requested_season_length).
+
+    The series may also be sent columnar ({ "values": [...] }) or in any
+    format payloads.py understands. Instead of 'data', a 'series_id' from
+    the series store can be given (see stored_series_fit). With a
+    'model_key', the fitted model is kept in the model registry. With
+    'downsample', a chart-sized 'history' of the series is added (see
+    history_block).
     """
     try:
-        body = request.get_json()
-        data_points = body.get('data', [])
+        body = request_body()
+        season_length = requested_season_length(body)
+
+        if 'series_id' in body:
+            fit, error = stored_series_fit(body, season_length)
+            if error:
+                return error
+            result = prediction_result(fit, forecast_values(fit, 3))
+            if 'downsample' in body:
+                result['history'] = history_block(body, None)
+            return respond(result)
 
-        if len(data_points) < 2:
+        values = series_values(body)
+
+        if len(values) < 2:
             return jsonify({
                 'error': 'Need at least 2 data points to make a prediction'
             }), 400
 
-        values = [point['value'] for point in data_points]
-        X = np.arange(len(values)).reshape(-1, 1)
-        y = np.array(values, dtype=float)
-
-        model = LinearRegression()
-        model.fit(X, y)
+        observe_series_lengths([len(values)])
+        with stage('fit'):
+            fit, version = fit_values(values, body.get('model_key'), season_length)
 
         # Generating future predictions
-        future_X = np.arange(len(values), len(values) + 3).reshape(-1, 1)
-        predictions = model.predict(future_X)
-        score = model.score(X, y)
+        predictions = forecast_values(fit, 3)
 
-        result = {
-            'predictions': [
-                {
-                    'label': f'Prediction {i + 1}',
-                    'value': round(float(pred), 2),
-                    'index': len(values) + i
-                }
-                for i, pred in enumerate(predictions)
-            ],
-            'model': {
-                'type': 'Linear Regression',
-                'accuracy': round(float(score * 100), 2),
-                'slope': round(float(model.coef_[0]), 2),
-                'intercept': round(float(model.intercept_), 2)
-            }
-        }
+        result = prediction_result(fit, predictions, version)
+        if 'downsample' in body:
+            result['history'] = history_block(body, values)
+        return respond(result)
 
-        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predicts the next 3 values for many named series in one request.
+    All series are fitted together in a single vectorized pass.
+
+    Expected JSON body:
+    {
+        "series": {
+            "Revenue": [{ "value": 100, "label": "Jan" }, ...],
+            "Sales": [...]
+        }
+    }
 
+    Each series gets the same result shape as /predict, or an 'error'
+    entry if it has fewer than 2 points. With a 'model_key', each series'
+    model is kept in the model registry under "<model_key>:<name>"; only
+    series whose data changed are refit (see ModelRegistry.fit_trends). A
+    'model' (and 'season_length') applies to every series, as in /predict;
+    exponential smoothing fits the series one by one.
+    """
+    try:
+        body = request_body()
+        series_data = body.get('series', {})
+        season_length = requested_season_length(body)
+
+        if not isinstance(series_data, dict) or not series_data:
+            return jsonify({'error': 'No series provided'}), 400
+
+        results = {}
+        names = []
+        values_list = []
+        for name, data_points in series_data.items():
+            values = series_values(data_points)
+            if len(values) < 2:
+                results[name] = {'error': 'Need at least 2 data points to make a prediction'}
+                continue
+            names.append(name)
+            values_list.append(values)
+
+        observe_series_lengths(len(values) for values in values_list)
+        model_key = body.get('model_key')
+        if model_key is not None and season_length is None:
+            # One registry pass: unchanged series reuse their stored fit, the rest are fitted together
+            keyed = []
+            for name, values in zip(names, values_list):
+                try:
+                    validate_model_key(f'{model_key}:{name}')
+                except ValueError as e:
+                    results[name] = {'error': str(e)}
+                    continue
+                keyed.append((name, values))
+            with stage('fit'):
+                fits, versions = model_registry.fit_trends(
+                    [f'{model_key}:{name}' for name, _ in keyed], [values for _, values in keyed]
+                )
+            for (name, _), fit, version in zip(keyed, fits, versions):
+                results[name] = prediction_result(fit, forecast(fit, 3), version)
+            return respond({'results': results})
+
+        if season_length is not None:
+            with stage('fit'):
+                for name, values in zip(names, values_list):
+                    try:
+                        fit, version = fit_values(
+                            values, f'{model_key}:{name}' if model_key is not None else None, season_length
+                        )
+                    except ValueError as e:
+                        results[name] = {'error': str(e)}
+                        continue
+                    results[name] = prediction_result(fit, forecast_values(fit, 3), version)
+            return respond({'results': results})
+
+        with stage('fit'):
+            fits = fit_trends(values_list)
+            predictions = forecast_many(fits, 3)
+
+        for name, fit, preds in zip(names, unpack_fits(fits), predictions):
+            results[name] = prediction_result(fit, preds)
+
+        return respond({'results': results})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def insight_message(cat_name, trend, change_pct, next_val, avg_val, min_val, max_val):
+    """
+    Generates the human-readable message for one category's insight.
+    """
+    if trend == 'up':
+        if change_pct > 10:
+            return f'🚀 {cat_name} is surging! Up {change_pct}% recently. Predicted next value: {next_val}.'
+        return f'📈 {cat_name} is growing steadily (+{change_pct}%). Next predicted: {next_val}.'
+    if trend == 'down':
+        if change_pct < -10:
+            return f'⚠️ Warning: {cat_name} dropped {abs(change_pct)}% recently. Predicted next: {next_val}. Consider taking action.'
+        return f'📉 {cat_name} is slightly declining ({change_pct}%). Next predicted: {next_val}.'
+    return f'➡️ {cat_name} is stable (avg: {avg_val}). Range: {min_val} – {max_val}. Next predicted: {next_val}.'
+
+
+def smoothing_trend_fits(fits):
+    """
+    Packs SmoothingFits into the TrendFits arrays insights_result reads: the
+    slope is the smoothed trend, and the intercept puts the line through
+    the next one-step forecast.
+    """
+    n = np.array([fit.n for fit in fits], dtype=np.int64)
+    slope = np.array([fit.trend for fit in fits], dtype=float)
+    next_vals = np.array([smoothing_forecast(fit, 1) for fit in fits], dtype=float)
+    r2 = np.array([fit.r2 for fit in fits], dtype=float)
+    return TrendFits(n, slope, next_vals - slope * n, r2)
+
+
+def insights_result(category_names, names, fits, stats):
+    """
+    Builds the /insights response body. `names` are the categories with
+    enough data, in the same order as the `fits` / `stats` arrays; every
+    other name in `category_names` gets a 'neutral' placeholder.
+    """
+    next_vals = fits.intercept + fits.slope * fits.n
+
+    # Recent change (last entry vs previous)
+    change_pcts = (stats.last - stats.previous) / np.maximum(np.abs(stats.previous), 1) * 100
+
+    trends = np.full(len(names), 'stable', dtype=object)
+    trends[fits.slope > 0.5] = 'up'
+    trends[fits.slope < -0.5] = 'down'
+
+    analysed = {}
+    rounded_changes = []
+    rows = zip(names, trends.tolist(), change_pcts.tolist(), next_vals.tolist(),
+               stats.mean.tolist(), stats.max.tolist(), stats.min.tolist(), fits.n.tolist())
+    for cat_name, trend, change_pct, next_val, avg_val, max_val, min_val, n in rows:
+        change_pct = round(change_pct, 1)
+        next_val = round(next_val, 2)
+        avg_val = round(avg_val, 1)
+        max_val = round(max_val, 1)
+        min_val = round(min_val, 1)
+        rounded_changes.append(change_pct)
+
+        analysed[cat_name] = {
+            'category': cat_name,
+            'trend': trend,
+            'change_pct': change_pct,
+            'message': insight_message(cat_name, trend, change_pct, next_val, avg_val, min_val, max_val),
+            'prediction': next_val,
+            'stats': {
+                'avg': avg_val,
+                'max': max_val,
+                'min': min_val,
+                'entries': n
+            }
+        }
+
+    insights_list = [
+        analysed.get(cat_name) or {
+            'category': cat_name,
+            'trend': 'neutral',
+            'change_pct': 0,
+            'message': f'{cat_name} has too few entries for analysis. Add more data.',
+            'prediction': None
+        }
+        for cat_name in category_names
+    ]
+
+    # Generate Global Summary
+    if insights_list:
+        up_count = int(np.count_nonzero(fits.slope > 0.5))
+        down_count = int(np.count_nonzero(fits.slope < -0.5))
+
+        summary_parts = []
+        if up_count > down_count:
+            summary_parts.append("Overall performance is positive.")
+        elif down_count > up_count:
+            summary_parts.append("Performance is trending downwards.")
+        else:
+            summary_parts.append("Performance is mixed or stable.")
+
+        # Mention top mover (neutral categories have no change and are never picked)
+        rounded_changes = np.array(rounded_changes)
+        if np.any(rounded_changes != 0):
+            top_mover = analysed[names[int(np.argmax(np.abs(rounded_changes)))]]
+            direction = "growth" if top_mover['change_pct'] > 0 else "decline"
+            summary_parts.append(f"{top_mover['category']} is seeing the most significant {direction} ({top_mover['change_pct']}%).")
+
+        global_summary = " ".join(summary_parts)
+    else:
+        global_summary = "Not enough data for a global summary."
+
+    return {'insights': insights_list, 'global_summary': global_summary}
+
+
 @app.route('/insights', methods=['POST'])
+@cached(result_cache, 'insights', uncached_keys=('series_ids',))
 def insights():
     """
     Receives data grouped by category and returns text-based AI insights
     analyzing trends, changes, and predictions for each category.
 
+    Statistics for all categories are computed together as grouped array
+    operations; only the message formatting runs per category.
+
     Expected JSON body:
     {
         "categories": {
@@ -149,111 +550,314 @@ def insights():
             "Sales": [...]
         }
     }
+
+    Or, for series kept in the series store, { "series_ids": { "Revenue": "<id>", ... } }
+    (a plain list of ids uses each id as its category name).
+
+    With "model": "holt" or "holt_winters" (see requested_season_length),
+    trends and next values come from exponential smoothing instead of the
+    linear trend, fitted per category.
     """
     try:
-        body = request.get_json()
+        body = request_body()
+        season_length = requested_season_length(body)
+        min_points = 2 if season_length is None else max(2, 2 * season_length)
+
+        if 'series_ids' in body:
+            series_ids = body['series_ids']
+            if isinstance(series_ids, list):
+                series_ids = {series_id: series_id for series_id in series_ids}
+
+            states = {}
+            for cat_name, series_id in series_ids.items():
+                state = series_store.get(series_id)
+                if state is None:
+                    return jsonify({'error': f'Unknown series: {series_id}'}), 404
+                states[cat_name] = state
+
+            names = [name for name, state in states.items() if state['n'] >= min_points]
+            fits, stats = states_to_arrays([states[name] for name in names])
+            if season_length is not None:
+                with stage('fit'):
+                    fits = smoothing_trend_fits([
+                        stored_series_fit({'series_id': series_ids[name]}, season_length)[0] for name in names
+                    ])
+            return respond(insights_result(list(states), names, fits, stats))
+
         categories_data = body.get('categories', {})
-        insights_list = []
+        category_values = {name: series_values(entries) for name, entries in categories_data.items()}
 
-        for cat_name, entries in categories_data.items():
-            if len(entries) < 2:
-                insights_list.append({
-                    'category': cat_name,
-                    'trend': 'neutral',
-                    'change_pct': 0,
-                    'message': f'{cat_name} has too few entries for analysis. Add more data.',
-                    'prediction': None
-                })
-                continue
+        names = [name for name, values in category_values.items() if len(values) >= min_points]
+        observe_series_lengths(len(values) for values in category_values.values())
+
+        # Overall trend via linear regression, plus summary stats, for every category at once
+        with stage('fit'):
+            packed = pack_series([category_values[name] for name in names])
+            if season_length is None:
+                fits = fit_trends(packed)
+            else:
+                fits = smoothing_trend_fits([fit_smoothing(category_values[name], season_length) for name in names])
+            stats = series_stats(packed)
 
-            values = [e['value'] for e in entries]
-            n = len(values)
+        return respond(insights_result(list(categories_data), names, fits, stats))
 
-            # Calculate recent change (last entry vs previous)
-            recent_change = values[-1] - values[-2]
-            change_pct = round((recent_change / max(abs(values[-2]), 1)) * 100, 1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            # Overall trend via linear regression
-            X = np.arange(n).reshape(-1, 1)
-            y = np.array(values, dtype=float)
-            model = LinearRegression()
-            model.fit(X, y)
-            slope = float(model.coef_[0])
 
-            # Predict next value
-            next_val = round(float(model.predict([[n]])[0]), 2)
+# Anomalies listed per category by /anomalies (the count covers all of them)
+DEFAULT_MAX_ANOMALIES = 100
 
-            # Determine trend
-            if slope > 0.5:
-                trend = 'up'
-            elif slope < -0.5:
-                trend = 'down'
-            else:
-                trend = 'stable'
-
-            # Generate human-readable message
-            avg_val = round(float(np.mean(values)), 1)
-            max_val = round(float(np.max(values)), 1)
-            min_val = round(float(np.min(values)), 1)
-
-            if trend == 'up':
-                if change_pct > 10:
-                    message = f'🚀 {cat_name} is surging! Up {change_pct}% recently. Predicted next value: {next_val}.'
-                else:
-                    message = f'📈 {cat_name} is growing steadily (+{change_pct}%). Next predicted: {next_val}.'
-            elif trend == 'down':
-                if change_pct < -10:
-                    message = f'⚠️ Warning: {cat_name} dropped {abs(change_pct)}% recently. Predicted next: {next_val}. Consider taking action.'
-                else:
-                    message = f'📉 {cat_name} is slightly declining ({change_pct}%). Next predicted: {next_val}.'
+
+def json_number(value, digits):
+    """Rounds a float for a response; NaN / infinite become None."""
+    return round(value, digits) if np.isfinite(value) else None
+
+
+@app.route('/anomalies', methods=['POST'])
+@cached(result_cache, 'anomalies', uncached_keys=('series_ids',))
+def anomalies():
+    """
+    Flags unusual points in every category at once from rolling statistics
+    (see anomalies.py): a point is an anomaly when it lies `threshold`
+    rolling standard deviations or more from the mean of the `window`
+    points before it.
+
+    Expected JSON body: "categories" as for /insights, or "series_ids" for
+    stored series, plus optional:
+      - window: points in the rolling window (default 20)
+      - threshold: |z| at which a point is flagged (default 3)
+      - alpha: EWMA weight of the newest point (default 0.3)
+      - max_anomalies: most recent anomalies listed per category (default 100)
+
+    Each category gets its anomalies, their total count and the rolling
+    statistics of its latest point; 'alerts' lists the categories whose
+    latest point is an anomaly.
+    """
+    try:
+        body = request_body()
+        window = int(body.get('window', DEFAULT_WINDOW))
+        threshold = float(body.get('threshold', DEFAULT_THRESHOLD))
+        alpha = float(body.get('alpha', DEFAULT_ALPHA))
+        max_anomalies = int(body.get('max_anomalies', DEFAULT_MAX_ANOMALIES))
+        if window < 2:
+            raise ValueError('window must be at least 2')
+        if threshold <= 0:
+            raise ValueError('threshold must be positive')
+        if not 0 < alpha <= 1:
+            raise ValueError('alpha must be between 0 and 1')
+
+        labels = {}
+        if 'series_ids' in body:
+            series_ids = body['series_ids']
+            if isinstance(series_ids, list):
+                series_ids = {series_id: series_id for series_id in series_ids}
+            category_values = {}
+            for cat_name, series_id in series_ids.items():
+                values = column_store.values(series_id)
+                if values is None:
+                    return jsonify({'error': f'Unknown series: {series_id}'}), 404
+                category_values[cat_name] = values
+        else:
+            category_values = {}
+            for cat_name, entries in body.get('categories', {}).items():
+                category_values[cat_name] = series_values(entries)
+                labels[cat_name] = series_labels(entries if isinstance(entries, dict) else {'data': entries})
+
+        results = {}
+        names = []
+        for cat_name, values in category_values.items():
+            if len(values) <= window:
+                results[cat_name] = {'error': f'Need more than {window} data points for a {window}-point window'}
             else:
-                message = f'➡️ {cat_name} is stable (avg: {avg_val}). Range: {min_val} – {max_val}. Next predicted: {next_val}.'
-
-            insights_list.append({
-                'category': cat_name,
-                'trend': trend,
-                'change_pct': change_pct,
-                'message': message,
-                'prediction': next_val,
-                'stats': {
-                    'avg': avg_val,
-                    'max': max_val,
-                    'min': min_val,
-                    'entries': n
+                names.append(cat_name)
+
+        observe_series_lengths(len(values) for values in category_values.values())
+        with stage('fit'):
+            packed = pack_series([category_values[name] for name in names])
+            stats = rolling_stats(packed, window, alpha)
+            points, owners = flag_anomalies(stats, threshold, packed.starts)
+            counts = np.bincount(owners, minlength=len(names))
+            # Flagged points are in packed order, so each category's are contiguous
+            bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        y = packed.values
+        alerts = []
+        for k, cat_name in enumerate(names):
+            start = int(packed.starts[k])
+            last = start + int(packed.lengths[k]) - 1
+            cat_labels = labels.get(cat_name)
+            first = bounds[k + 1] - min(counts[k], max(max_anomalies, 0))
+
+            flagged = []
+            for point in points[first:bounds[k + 1]].tolist():
+                z = float(stats.z[point])
+                anomaly = {
+                    'index': point - start,
+                    'value': round(float(y[point]), 2),
+                    'expected': round(float(stats.mean[point]), 2),
+                    'z': json_number(z, 2),
+                    'ewma': round(float(stats.ewma[point]), 2),
+                    'direction': 'spike' if z > 0 else 'drop',
                 }
-            })
+                if cat_labels is not None and len(cat_labels) == packed.lengths[k]:
+                    anomaly['label'] = cat_labels[point - start]
+                flagged.append(anomaly)
+
+            latest_z = float(stats.z[last])
+            latest_anomaly = bool(abs(latest_z) >= threshold)
+            if latest_anomaly:
+                alerts.append(cat_name)
+            results[cat_name] = {
+                'entries': int(packed.lengths[k]),
+                'anomaly_count': int(counts[k]),
+                'anomalies': flagged,
+                'latest': {
+                    'value': round(float(y[last]), 2),
+                    'rolling_mean': round(float(stats.mean[last]), 2),
+                    'rolling_std': round(float(stats.std[last]), 2),
+                    'z': json_number(latest_z, 2),
+                    'ewma': round(float(stats.ewma[last]), 2),
+                    'anomaly': latest_anomaly,
+                },
+            }
 
-        # Generate Global Summary
-        if insights_list:
-            up_trends = [i for i in insights_list if i['trend'] == 'up']
-            down_trends = [i for i in insights_list if i['trend'] == 'down']
-            stable_trends = [i for i in insights_list if i['trend'] == 'stable']
-            
-            summary_parts = []
-            if len(up_trends) > len(down_trends):
-                summary_parts.append("Overall performance is positive.")
-            elif len(down_trends) > len(up_trends):
-                summary_parts.append("Performance is trending downwards.")
-            else:
-                summary_parts.append("Performance is mixed or stable.")
-
-            # Mention top mover
-            # Filter out items with 0 change or neutral
-            movers = [i for i in insights_list if abs(i['change_pct']) > 0]
-            if movers:
-                top_mover = max(movers, key=lambda x: abs(x['change_pct']))
-                direction = "growth" if top_mover['change_pct'] > 0 else "decline"
-                summary_parts.append(f"{top_mover['category']} is seeing the most significant {direction} ({top_mover['change_pct']}%).")
-            
-            global_summary = " ".join(summary_parts)
-        else:
-            global_summary = "Not enough data for a global summary."
+        return respond({
+            'window': window,
+            'threshold': threshold,
+            'alpha': alpha,
+            'results': {name: results[name] for name in category_values},
+            'alerts': alerts,
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def series_summary(state):
+    """Public view of a series store state."""
+    return {
+        'series_id': state['id'],
+        'entries': state['n'],
+        'last': state['last'][-1] if state['last'] else None,
+        'avg': state['mean_y'] if state['n'] else None,
+        'max': state['max'],
+        'min': state['min'],
+    }
+
+
+@app.route('/series/<series_id>/append', methods=['POST'])
+def series_append(series_id):
+    """
+    Appends new points to a stored series, creating it if needed.
+    The raw points go to the column store and each point is an O(1)
+    update of the series' running statistics.
+
+    Expected JSON body:
+    { "values": [101.5, 99.2], "labels": ["Mon", "Tue"], "timestamps": ["2024-01-01T00:00:00Z", ...] }
+    or { "value": 101.5, "label": "Mon", "timestamp": ... }. Labels and timestamps are optional.
+    """
+    try:
+        body = request_body()
+        values = body.get('values')
+        labels = body.get('labels')
+        timestamps = body.get('timestamps')
+        if values is None and 'value' in body:
+            values = [body['value']]
+            labels = [body['label']] if 'label' in body else None
+            timestamps = [body['timestamp']] if 'timestamp' in body else None
+        if values is None or len(values) == 0:
+            return jsonify({'error': 'No values provided'}), 400
+
+        values = as_values(values)
+        # One lock over both stores keeps the running statistics in step with the raw points
+        with column_store.locked(series_id):
+            column_store.append(series_id, values, labels, timestamps)
+            state = series_store.append(series_id, values)
+        return jsonify(series_summary(state)), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/series/<series_id>', methods=['GET', 'DELETE'])
+def series_detail(series_id):
+    """
+    GET returns a stored series' summary; DELETE removes the series.
+    """
+    try:
+        if request.method == 'DELETE':
+            with column_store.locked(series_id):
+                deleted = series_store.delete(series_id)
+                deleted = column_store.delete(series_id) or deleted
+            if not deleted:
+                return jsonify({'error': f'Unknown series: {series_id}'}), 404
+            return jsonify({'deleted': series_id}), 200
+
+        state = series_store.get(series_id)
+        if state is None:
+            return jsonify({'error': f'Unknown series: {series_id}'}), 404
+        return jsonify(series_summary(state)), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/series/<series_id>/points', methods=['GET'])
+def series_points(series_id):
+    """
+    Reads raw points of a stored series by index range (?start=&stop=,
+    slice semantics) and/or inclusive date range (?from=&to=).
+    """
+    try:
+        start = request.args.get('start', type=int)
+        stop = request.args.get('stop', type=int)
+        points = column_store.read(series_id, start, stop, request.args.get('from'), request.args.get('to'))
+        if points is None:
+            return jsonify({'error': f'Unknown series: {series_id}'}), 404
+        return jsonify({'series_id': series_id, **points}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        return jsonify({'insights': insights_list, 'global_summary': global_summary}), 200
 
+@app.route('/series/<series_id>/compact', methods=['POST'])
+def series_compact(series_id):
+    """
+    Rewrites a stored series' files at their exact size. With "keep_last",
+    older points are dropped and the running statistics are rebuilt from
+    the points that remain.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        keep_last = body.get('keep_last')
+        keep_last = int(keep_last) if keep_last is not None else None
+
+        with column_store.locked(series_id):
+            meta = column_store.compact(series_id, keep_last)
+            if meta is not None and keep_last is not None:
+                series_store.replace(series_id, column_store.values(series_id))
+        if meta is None:
+            return jsonify({'error': f'Unknown series: {series_id}'}), 404
+
+        return jsonify({'series_id': series_id, 'entries': meta['length']}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
 @app.route('/generate-report', methods=['POST'])
 def generate_report():
     try:
@@ -261,237 +865,555 @@ def generate_report():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Create PDF buffer
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        # Title
-        p.setFont("Helvetica-Bold", 24)
-        p.drawString(50, height - 50, "SmartDash AI Report")
-        
-        # Date
-        p.setFont("Helvetica", 12)
-        p.drawString(50, height - 70, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-
-        # Global Summary
-        y_position = height - 120
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(50, y_position, "Executive Summary")
-        y_position -= 25
-        
-        p.setFont("Helvetica", 12)
-        summary_text = data.get('global_summary', 'No summary available.')
-        
-        # Simple text wrapping (very basic)
-        words = summary_text.split()
-        line = ""
-        for word in words:
-            if p.stringWidth(line + " " + word, "Helvetica", 12) < 500:
-                line += " " + word
-            else:
-                p.drawString(50, y_position, line.strip())
-                y_position -= 15
-                line = word
-        p.drawString(50, y_position, line.strip())
-        y_position -= 40
-
-        # Insights
-        if 'insights' in data and data['insights']:
-            p.setFont("Helvetica-Bold", 16)
-            p.drawString(50, y_position, "Key Insights")
-            y_position -= 25
-            p.setFont("Helvetica", 12)
-
-            for insight in data['insights']:
-                if y_position < 50: # New page
-                    p.showPage()
-                    y_position = height - 50
-                
-                cat = insight.get('category', 'Unknown')
-                msg = insight.get('message', '')
-                trend = insight.get('trend', '')
-                
-                # Bullet point
-                p.setFont("Helvetica-Bold", 12)
-                p.drawString(50, y_position, f"• {cat} ({trend.upper()})")
-                y_position -= 15
-                p.setFont("Helvetica", 10)
-                p.drawString(70, y_position, msg)
-                y_position -= 25
-
-        p.showPage()
-        p.save()
-        buffer.seek(0)
+        # Reports rendered earlier (e.g. by an async job) are served from disk
+        job_id = report_id(data)
+        if report_jobs.status(job_id) == 'done':
+            return send_file(report_jobs.pdf_path(job_id), as_attachment=True,
+                             download_name='smart_dash_report.pdf', mimetype='application/pdf')
 
+        with stage('render'):
+            buffer = io.BytesIO(render_report(data))
         return send_file(buffer, as_attachment=True, download_name='smart_dash_report.pdf', mimetype='application/pdf')
 
     except Exception as e:
         print(f"Report Error: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/correlations', methods=['GET'])
+@app.route('/reports', methods=['POST'])
+def submit_report():
+    """
+    Queues a PDF report for background rendering and returns its job id
+    right away (202). Identical payloads share one job, so a report that
+    is already rendered is reported as done without new work.
+    """
+    try:
+        data = request.json
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        job_id, status = report_jobs.submit(data)
+        return jsonify({'job_id': job_id, 'status': status}), 200 if status == 'done' else 202
+    except Overloaded as e:
+        response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, e.status
+    except Exception as e:
+        print(f"Report Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/<job_id>', methods=['GET'])
+def report_status(job_id):
+    try:
+        status = report_jobs.status(job_id)
+        if status is None:
+            return jsonify({'error': f"Report '{job_id}' not found"}), 404
+        result = {'job_id': job_id, 'status': status}
+        if status == 'failed':
+            result['error'] = report_jobs.error(job_id)
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/<job_id>/download', methods=['GET'])
+def download_report(job_id):
+    try:
+        status = report_jobs.status(job_id)
+        if status is None:
+            return jsonify({'error': f"Report '{job_id}' not found"}), 404
+        if status != 'done':
+            return jsonify({'job_id': job_id, 'status': status}), 409
+        return send_file(report_jobs.pdf_path(job_id), as_attachment=True,
+                         download_name='smart_dash_report.pdf', mimetype='application/pdf')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Longest lag /correlations will scan for
+MAX_CORRELATION_LAG = 10_000
+
+
+def correlation_results(names, stats, min_abs_corr=0.3, top_k=None, lagged=False):
+    """
+    Builds the /correlations list from PairStats (or LagStats, with
+    `lagged`) over the categories `names`: pairs with |correlation| >=
+    min_abs_corr, strongest first, at most `top_k` of them.
+    """
+    # "If A increases by 10%, B increases by X%"
+    a_change_pct = 10
+    b_change_abs = stats.source_mean * (a_change_pct / 100) * stats.slope
+    b_change_pcts = (b_change_abs / np.maximum(np.abs(stats.target_mean), 1)) * 100
+
+    selected = top_pairs(stats, (np.abs(stats.corr) >= min_abs_corr) & (stats.source_mean != 0), top_k)
+
+    results = []
+    for idx in selected.tolist():
+        cat_a = names[stats.source[idx]]
+        cat_b = names[stats.target[idx]]
+        corr = float(stats.corr[idx])
+        b_change_pct = round(float(b_change_pcts[idx]), 1)
+
+        strength = 'strong' if abs(corr) > 0.7 else 'moderate' if abs(corr) > 0.4 else 'weak'
+        direction = 'positive' if corr > 0 else 'negative'
+
+        # Generate message
+        arrow_b = '↑' if b_change_pct >= 0 else '↓'
+        if corr > 0:
+            message = f"When {cat_a} ↑10%, {cat_b} tends to {arrow_b}{abs(b_change_pct)}%"
+        else:
+            message = f"When {cat_a} ↑10%, {cat_b} tends to ↓{abs(b_change_pct)}%"
+
+        result = {
+            'from': cat_a,
+            'to': cat_b,
+            'correlation': round(corr, 3),
+            'strength': strength,
+            'direction': direction,
+            'impact_pct': b_change_pct,
+            'message': message
+        }
+        if lagged:
+            lag = int(stats.lag[idx])
+            result['lag'] = lag
+            if lag:
+                periods = 'period' if lag == 1 else 'periods'
+                result['message'] = f"{cat_a} leads {cat_b} by {lag} {periods}: {message} {lag} {periods} later"
+        results.append(result)
+
+    return results
+
+
+@app.route('/correlations', methods=['GET', 'POST'])
+@cached(result_cache, 'correlations')
 def correlations():
     """
     Analyzes cross-category correlations.
     Takes category data and computes how changes in one category
     relate to changes in others (e.g., Users ↑ → Revenue ↑).
+
+    All pairs are scored at once from aligned value matrices (see
+    correlation.py). Optional body parameters:
+      - min_abs_corr: only report pairs with |correlation| >= this (default 0.3)
+      - top_k: only report the k strongest pairs
+      - max_lag: scan lags up to this many periods either way (see
+        correlation.lagged_stats) and report each pair at its strongest
+        lag, leader first, with a 'lag' field (e.g. signups lead revenue by 2)
+    POST is the supported form; GET with a JSON body is kept for older callers.
     """
     try:
-        body = request.get_json()
+        body = request_body()
         categories_data = body.get('categories', {})
+        min_abs_corr = float(body.get('min_abs_corr', 0.3))
+        top_k = body.get('top_k')
+        top_k = int(top_k) if top_k is not None else None
+        max_lag = body.get('max_lag')
+        max_lag = int(max_lag) if max_lag is not None else None
+        if max_lag is not None and not 0 <= max_lag <= MAX_CORRELATION_LAG:
+            return jsonify({'error': f'max_lag must be between 0 and {MAX_CORRELATION_LAG}'}), 400
 
         cat_names = list(categories_data.keys())
         if len(cat_names) < 2:
             return jsonify({'correlations': [], 'message': 'Need at least 2 categories to find correlations'}), 200
 
         # Build value arrays per category (use average per entry index)
-        cat_values = {}
+        names = []
+        cat_values = []
         for cat_name, entries in categories_data.items():
-            if len(entries) >= 2:
-                vals = [float(e['value']) for e in entries]
-                cat_values[cat_name] = vals
-
-        results = []
-        processed = set()
-
-        for cat_a in cat_values:
-            for cat_b in cat_values:
-                if cat_a == cat_b:
-                    continue
-                pair_key = tuple(sorted([cat_a, cat_b]))
-                if pair_key in processed:
-                    continue
-                processed.add(pair_key)
-
-                vals_a = cat_values[cat_a]
-                vals_b = cat_values[cat_b]
-
-                # Align lengths
-                min_len = min(len(vals_a), len(vals_b))
-                if min_len < 2:
-                    continue
-
-                a = np.array(vals_a[:min_len], dtype=float)
-                b = np.array(vals_b[:min_len], dtype=float)
-
-                # Pearson correlation
-                if np.std(a) == 0 or np.std(b) == 0:
-                    continue
+            values = series_values(entries)
+            if len(values) >= 2:
+                names.append(cat_name)
+                cat_values.append(values)
 
-                corr = float(np.corrcoef(a, b)[0, 1])
-
-                # Compute slope: how much does B change per unit of A?
-                model = LinearRegression()
-                model.fit(a.reshape(-1, 1), b)
-                slope = float(model.coef_[0])
-
-                # Calculate descriptive impact
-                avg_a = float(np.mean(a))
-                avg_b = float(np.mean(b))
-
-                if avg_a == 0:
-                    continue
+        observe_series_lengths(len(values) for values in cat_values)
+        with stage('fit'):
+            stats = pairwise_stats(cat_values) if max_lag is None else lagged_stats(cat_values, max_lag)
 
-                # "If A increases by 10%, B increases by X%"
-                a_change_pct = 10
-                a_change_abs = avg_a * (a_change_pct / 100)
-                b_change_abs = a_change_abs * slope
-                b_change_pct = round((b_change_abs / max(abs(avg_b), 1)) * 100, 1)
+        return respond({'correlations': correlation_results(names, stats, min_abs_corr, top_k, max_lag is not None)})
 
-                strength = 'strong' if abs(corr) > 0.7 else 'moderate' if abs(corr) > 0.4 else 'weak'
-                direction = 'positive' if corr > 0 else 'negative'
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-                # Generate message
-                if abs(corr) >= 0.3:
-                    arrow_a = '↑' if b_change_pct >= 0 else '↑'
-                    arrow_b = '↑' if b_change_pct >= 0 else '↓'
 
-                    if corr > 0:
-                        message = f"When {cat_a} {arrow_a}10%, {cat_b} tends to {arrow_b}{abs(b_change_pct)}%"
-                    else:
-                        message = f"When {cat_a} ↑10%, {cat_b} tends to ↓{abs(b_change_pct)}%"
+# Bounds for the /simulate scenario grid
+MAX_SIMULATION_MULTIPLIERS = 1000
+MAX_SIMULATION_STEPS = 10_000
+MAX_SIMULATION_DRAWS = 10_000
+# Bounds on their products: scenario cells (multipliers x horizons) in the
+# response and simulated values (draws x horizons) held in memory
+MAX_SIMULATION_CELLS = 100_000
+MAX_SIMULATION_SAMPLES = 2_000_000
 
-                    results.append({
-                        'from': cat_a,
-                        'to': cat_b,
-                        'correlation': round(corr, 3),
-                        'strength': strength,
-                        'direction': direction,
-                        'impact_pct': b_change_pct,
-                        'message': message
-                    })
 
-        # Sort by correlation strength
-        results.sort(key=lambda x: abs(x['correlation']), reverse=True)
+def simulation_residuals(body, fit, values):
+    """
+    Residuals to bootstrap simulation noise from, or (None, residual sum of
+    squares) for a stored series whose raw points are not available.
+    """
+    if values is None and 'series_id' in body:
+        values = column_store.values(
+            body['series_id'], body.get('start'), body.get('stop'), body.get('from'), body.get('to')
+        )
+    if values is not None and len(values) == fit.n:
+        return trend_residuals(values, fit), None
+    return None, state_ss_res(series_store.get(body['series_id']))
 
-        return jsonify({'correlations': results}), 200
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+def scenario_grid(body, fit, values):
+    """
+    Builds the 'scenarios' block of /simulate: every multiplier applied to
+    the forecast at every horizon, as one (multipliers x horizons) array.
+    With 'draws', adds lower / upper confidence bands from that many
+    simulated forecasts (see trend.simulate_forecasts and
+    smoothing.simulate_smoothing). Scaling by a
+    multiplier scales the band too (and swaps it for negative multipliers),
+    so the draws are simulated once for all scenarios.
+    """
+    multipliers = np.asarray(body.get('multipliers', [body.get('multiplier', 1.0)]), dtype=float).ravel()
+    horizons = body.get('horizons', 6)
+    steps = np.arange(1, int(horizons) + 1) if np.isscalar(horizons) else np.asarray(horizons, dtype=np.int64)
+    draws = int(body.get('draws', 0))
+    interval = float(body.get('interval', 0.9))
+
+    if not 0 < len(multipliers) <= MAX_SIMULATION_MULTIPLIERS:
+        raise ValueError(f'Provide 1 to {MAX_SIMULATION_MULTIPLIERS} multipliers')
+    if len(steps) == 0 or steps.min() < 1 or steps.max() > MAX_SIMULATION_STEPS:
+        raise ValueError(f'Horizons must be between 1 and {MAX_SIMULATION_STEPS}')
+    if not 0 <= draws <= MAX_SIMULATION_DRAWS:
+        raise ValueError(f'draws must be between 0 and {MAX_SIMULATION_DRAWS}')
+    if not 0 < interval < 1:
+        raise ValueError('interval must be between 0 and 1')
+    if len(multipliers) * len(steps) > MAX_SIMULATION_CELLS:
+        raise ValueError(f'multipliers x horizons must be at most {MAX_SIMULATION_CELLS} scenarios')
+    if draws * len(steps) > MAX_SIMULATION_SAMPLES:
+        raise ValueError(f'draws x horizons must be at most {MAX_SIMULATION_SAMPLES} simulated values')
+
+    smoothed = isinstance(fit, SmoothingFit)
+    baseline = smoothing_forecast(fit, steps) if smoothed else fit.intercept + fit.slope * (fit.n - 1 + steps)
+    m = multipliers[:, None]
+    grid = {
+        'multipliers': multipliers.tolist(),
+        'horizons': steps.tolist(),
+        'baseline': np.round(baseline, 2).tolist(),
+        'projected': np.round(m * baseline, 2).tolist(),
+    }
+    if draws and smoothed:
+        simulated = simulate_smoothing(fit, steps, draws, seed=int(body.get('seed', 0)))
+    elif draws:
+        residuals, ss_res = simulation_residuals(body, fit, values)
+        simulated = simulate_forecasts(fit, steps, draws, residuals=residuals, ss_res=ss_res,
+                                       seed=int(body.get('seed', 0)))
+    if draws:
+        tail = (1 - interval) / 2 * 100
+        low, high = np.percentile(simulated, [tail, 100 - tail], axis=0)
+        grid.update(
+            lower=np.round(np.where(m >= 0, m * low, m * high), 2).tolist(),
+            upper=np.round(np.where(m >= 0, m * high, m * low), 2).tolist(),
+            draws=draws,
+            interval=interval,
+        )
+    return grid
 
 
 @app.route('/simulate', methods=['POST'])
+@cached(result_cache, 'simulate', uncached_keys=('series_id', 'model_key'))
 def simulate():
     """
     Receives data points and a growth multiplier, returns original predictions
     alongside multiplied projected predictions for What-If analysis.
+    Like /predict, accepts a stored 'series_id' instead of 'data', a
+    'model_key' to keep the fitted model in the model registry, a
+    'model' to forecast with exponential smoothing and 'downsample' for a
+    chart-sized 'history'.
+
+    For a whole slider range in one call, send any of:
+      - multipliers: list of multipliers
+      - horizons: list of periods ahead (1 = next), or a count (default 6)
+      - draws: number of simulated forecasts for confidence bands (default 0)
+      - interval: band coverage (default 0.9); seed: random seed (default 0)
+    The response then has a 'scenarios' block (see scenario_grid), all from
+    the same single fit.
     """
     try:
-        body = request.get_json()
-        data_points = body.get('data', [])
+        body = request_body()
         multiplier = float(body.get('multiplier', 1.0))
+        season_length = requested_season_length(body)
+        version = None
+        values = None
+
+        if 'series_id' in body:
+            fit, error = stored_series_fit(body, season_length)
+            if error:
+                return error
+        else:
+            values = series_values(body)
 
-        if len(data_points) < 2:
-            return jsonify({'error': 'Need at least 2 data points'}), 400
-
-        values = [point['value'] for point in data_points]
-        X = np.arange(len(values)).reshape(-1, 1)
-        y = np.array(values, dtype=float)
+            if len(values) < 2:
+                return jsonify({'error': 'Need at least 2 data points'}), 400
 
-        model = LinearRegression()
-        model.fit(X, y)
+            observe_series_lengths([len(values)])
+            with stage('fit'):
+                fit, version = fit_values(values, body.get('model_key'), season_length)
 
         # Predict next 6 periods
-        future_X = np.arange(len(values), len(values) + 6).reshape(-1, 1)
-        base_predictions = model.predict(future_X)
+        base_predictions = forecast_values(fit, 6)
+        model = model_info(fit)
+        model.pop('intercept', None)
 
         result = {
             'original': [
-                {'label': f'Prediction {i+1}', 'value': round(float(p), 2), 'index': len(values) + i}
+                {'label': f'Prediction {i+1}', 'value': round(float(p), 2), 'index': fit.n + i}
                 for i, p in enumerate(base_predictions)
             ],
             'projected': [
-                {'label': f'Prediction {i+1}', 'value': round(float(p * multiplier), 2), 'index': len(values) + i}
+                {'label': f'Prediction {i+1}', 'value': round(float(p * multiplier), 2), 'index': fit.n + i}
                 for i, p in enumerate(base_predictions)
             ],
             'multiplier': multiplier,
-            'model': {
-                'type': 'Linear Regression',
-                'accuracy': round(float(model.score(X, y) * 100), 2),
-                'slope': round(float(model.coef_[0]), 2)
-            }
+            'model': model
         }
-        return jsonify(result), 200
+        if version is not None:
+            result['model']['version'] = version
+        if any(key in body for key in ('multipliers', 'horizons', 'draws')):
+            with stage('simulate'):
+                result['scenarios'] = scenario_grid(body, fit, values)
+        if 'downsample' in body:
+            result['history'] = history_block(body, values)
+        return respond(result)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+
+@app.route('/downsample', methods=['POST'])
+@cached(result_cache, 'downsample', uncached_keys=('series_id',))
+def downsample():
+    """
+    Reduces a long series to a few hundred points that keep its shape, for
+    charts (see downsample.py).
+
+    Expected JSON body: the series as for /predict ('data', columnar
+    'values' / 'labels', or a stored 'series_id' with an optional range),
+    plus:
+      - points: target number of points (default 500)
+      - method: 'lttb' (default) or 'minmax'
+    Point indices count from the start of the selected range.
+    """
+    try:
+        body = request_body()
+        if 'series_id' in body:
+            values = column_store.values(
+                body['series_id'], body.get('start'), body.get('stop'), body.get('from'), body.get('to')
+            )
+            if values is None:
+                return jsonify({'error': f"Unknown series: {body['series_id']}"}), 404
+        else:
+            values = series_values(body)
+
+        observe_series_lengths([len(values)])
+        options = {'points': body.get('points', DEFAULT_POINTS), 'method': body.get('method', 'lttb')}
+        with stage('downsample'):
+            points = downsampled_points(values, options, series_labels(body))
+        return respond({'method': options['method'], 'total': len(values), 'series': points})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def snapshot_pass(category_values, digests, state):
+    """
+    Computes a dashboard snapshot of `category_values` ({name: values}, in
+    display order; `digests` are their data hashes) in one pass: trend
+    fits and summary stats from one packed array, then insights,
+    forecasts and correlations from those arrays. Categories whose hash
+    matches their entry in `state` (the latest version's) are not refit;
+    their numbers are taken from the state.
+
+    Returns (snapshot, state, changed): the snapshot document, the state
+    to store with it and the categories that were recomputed.
+    """
+    changed = [name for name in category_values if state.get(name, {}).get('data_hash') != digests[name]]
+    fresh = [name for name in changed if len(category_values[name]) >= 2]
+
+    with stage('fit'):
+        packed = pack_series([category_values[name] for name in fresh])
+        fresh_fits = fit_trends(packed)
+        fresh_stats = series_stats(packed)
+
+    new_state = {name: state[name] for name in category_values if name not in changed}
+    for name in changed:
+        new_state[name] = {'data_hash': digests[name], 'n': len(category_values[name])}
+    columns = {field: values.tolist() for field, values in [*fresh_fits._asdict().items(), *fresh_stats._asdict().items()]}
+    for i, name in enumerate(fresh):
+        new_state[name].update({field: values[i] for field, values in columns.items()})
+    new_state = {name: new_state[name] for name in category_values}
+
+    # Every category with a fit, refit or not, as the arrays the routes use
+    names = [name for name, entry in new_state.items() if 'slope' in entry]
+    fits = TrendFits(
+        np.array([new_state[name]['n'] for name in names], dtype=np.int64),
+        *(np.array([new_state[name][field] for name in names], dtype=float) for field in TrendFits._fields[1:])
+    )
+    stats = SeriesStats(*(np.array([new_state[name][field] for name in names], dtype=float) for field in SeriesStats._fields))
+
+    predictions = {name: {'error': 'Need at least 2 data points to make a prediction'} for name in category_values}
+    for name, fit, forecasts in zip(names, unpack_fits(fits), forecast_many(fits, 3)):
+        predictions[name] = prediction_result(fit, forecasts)
+
+    # Pairs span all categories, so any change rescores them (one matrix pass)
+    with stage('fit'):
+        pair_stats = pairwise_stats([category_values[name] for name in names])
+
+    snapshot = {
+        'categories': list(category_values),
+        'changed': changed,
+        **insights_result(list(category_values), names, fits, stats),
+        'predictions': predictions,
+        'correlations': correlation_results(names, pair_stats),
+    }
+    return snapshot, new_state, changed
 
 
+@app.route('/snapshots/<tenant>', methods=['POST'])
+def snapshot_refresh(tenant):
+    """
+    Computes the dashboard snapshot of a tenant (e.g. a user id) and stores
+    it as a new version, so the dashboard can read insights, per-category
+    forecasts and correlations with one lookup (GET /snapshots/<tenant>).
+
+    Expected JSON body, as for /insights:
+    {
+        "categories": { "Revenue": [{ "value": 100, ... }, ...], "Sales": [...] }
+    }
+
+    Only categories whose data changed since the latest version are refit
+    (see snapshot_pass). With "partial": true, the categories sent replace
+    theirs and every other category is kept from the latest version, so a
+    caller that changed one category can send just that one; "removed":
+    [...] drops categories. When nothing changed, the latest version is
+    returned as it is.
+    """
+    try:
+        body = request_body()
+        sent = {name: series_values(entries) for name, entries in body.get('categories', {}).items()}
+        removed = set(body.get('removed', []))
+        observe_series_lengths(len(values) for values in sent.values())
+
+        with snapshot_store.locked(tenant):
+            state = snapshot_store.state(tenant)
+            if body.get('partial'):
+                names = [name for name in state if name not in removed] + [name for name in sent if name not in state]
+            else:
+                names = [name for name in sent if name not in removed]
+
+            category_values, digests = {}, {}
+            for name in names:
+                if name in sent:
+                    category_values[name] = sent[name]
+                    digests[name] = category_hash(sent[name])
+                    continue
+                digests[name] = state[name]['data_hash']
+                category_values[name] = snapshot_store.values(tenant, digests[name])
+                if category_values[name] is None:
+                    return jsonify({'error': f"Stored values of '{name}' are missing; send all categories"}), 409
+
+            latest = snapshot_store.path(tenant)
+            if latest and list(state) == names and all(state[name]['data_hash'] == digests[name] for name in names):
+                return send_file(latest, mimetype='application/json')
+
+            snapshot, new_state, changed = snapshot_pass(category_values, digests, state)
+            version = snapshot_store.save(
+                tenant, snapshot, new_state, {digests[name]: sent[name] for name in sent if name in digests}, changed
+            )
+            return send_file(snapshot_store.path(tenant, version), mimetype='application/json')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/snapshots/<tenant>', methods=['GET', 'DELETE'])
+def snapshot_detail(tenant):
+    """
+    GET returns the stored snapshot of a tenant: the latest, or an older
+    one with ?version=. DELETE removes all of its versions.
+    """
+    try:
+        if request.method == 'DELETE':
+            if not snapshot_store.delete(tenant):
+                return jsonify({'error': f"No snapshots for '{tenant}'"}), 404
+            return jsonify({'deleted': tenant}), 200
+
+        path = snapshot_store.path(tenant, request.args.get('version', type=int))
+        if path is None:
+            return jsonify({'error': f"No such snapshot version for '{tenant}'"}), 404
+        return send_file(path, mimetype='application/json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/snapshots/<tenant>/versions', methods=['GET'])
+def snapshot_versions(tenant):
+    """Lists the stored snapshot versions of a tenant, oldest first."""
+    try:
+        versions = snapshot_store.versions(tenant)
+        if not versions:
+            return jsonify({'error': f"No snapshots for '{tenant}'"}), 404
+        return jsonify({'tenant': tenant, 'versions': versions}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
 @app.route('/download-model', methods=['GET'])
 def download_model():
     """
-    Downloads the last trained model pickle file.
+    Downloads a model from the model registry: ?key=<model key> and an
+    optional &version= (default: latest).
     """
     try:
-        model_path = os.path.join(MODELS_DIR, 'model.pkl')
-        if not os.path.exists(model_path):
-            return jsonify({'error': 'No model trained yet. Run a prediction first.'}), 404
-        
-        return send_file(model_path, as_attachment=True, download_name='model.pkl')
+        key = request.args.get('key')
+        if key is None:
+            return jsonify({'error': 'No model key provided'}), 400
+        version, path = model_registry.path(key, request.args.get('version', type=int))
+        if path is None:
+            return jsonify({'error': f"No such model version for '{key}'"}), 404
+        return send_file(path, as_attachment=True, download_name=f'model_v{version}.joblib')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/models', methods=['GET', 'DELETE'])
+def model_versions():
+    """
+    GET lists the stored versions of ?key=<model key>; DELETE removes them.
+    """
+    try:
+        key = request.args.get('key')
+        if key is None:
+            return jsonify({'error': 'No model key provided'}), 400
+        if request.method == 'DELETE':
+            if not model_registry.delete(key):
+                return jsonify({'error': f"Unknown model key: '{key}'"}), 404
+            return jsonify({'deleted': key}), 200
+        versions = model_registry.versions(key)
+        if not versions:
+            return jsonify({'error': f"Unknown model key: '{key}'"}), 404
+        return jsonify({'key': key, 'versions': versions}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -500,6 +1422,9 @@ def download_model():
 def predict_from_file():
     """
     Receives a file upload, parses it, and returns predictions.
+    An optional 'model_key' form field keeps the model in the registry, and
+    a 'downsample' field (target point count) adds a chart-sized 'history'
+    of the whole file next to the last 10 points.
     """
     try:
         if 'file' not in request.files:
@@ -512,44 +1437,38 @@ def predict_from_file():
         if not (file.filename.lower().endswith('.txt') or file.filename.lower().endswith('.pdf')):
              return jsonify({'error': 'Only .txt and .pdf files are supported'}), 400
 
-        # Parse file
-        data_points = parse_file_content(file.stream, file.filename)
+        # Parse file (streamed; only the last 10 labels are kept for context)
+        with stage('parse'):
+            parsed = parse_file_content(
+                file.stream, file.filename,
+                max_points=MAX_UPLOAD_POINTS, max_bytes=MAX_UPLOAD_BYTES, label_tail=10
+            )
         
-        if len(data_points) < 2:
+        if len(parsed.values) < 2:
             return jsonify({'error': 'Need at least 2 data points in file to make predictions'}), 400
 
         # Run prediction logic (same as /predict)
-        values = [point['value'] for point in data_points]
-        X = np.arange(len(values)).reshape(-1, 1)
-        y = np.array(values, dtype=float)
-
-        model = LinearRegression()
-        model.fit(X, y)
+        observe_series_lengths([len(parsed.values)])
+        with stage('fit'):
+            fit, version = fit_values(parsed.values, request.form.get('model_key'))
 
-        future_X = np.arange(len(values), len(values) + 3).reshape(-1, 1)
-        predictions = model.predict(future_X)
-        score = model.score(X, y)
+        predictions = forecast(fit, 3)
 
-        result = {
-            'predictions': [
-                {
-                    'label': f'Prediction {i + 1}',
-                    'value': round(float(pred), 2),
-                    'index': len(values) + i
-                }
-                for i, pred in enumerate(predictions)
-            ],
-            'original_data': data_points[-10:], # Return last 10 points for context
-            'model': {
-                'type': 'Linear Regression',
-                'accuracy': round(float(score * 100), 2),
-                'slope': round(float(model.coef_[0]), 2),
-                'intercept': round(float(model.intercept_), 2)
-            }
-        }
+        result = prediction_result(fit, predictions, version)
+        result['original_data'] = [ # Return last 10 points for context
+            {'label': label, 'value': value}
+            for label, value in zip(parsed.labels, parsed.values[-10:].tolist())
+        ]
+        downsample = request.form.get('downsample', type=int)
+        if downsample is not None:
+            result['history'] = downsampled_points(parsed.values, downsample)
 
         return jsonify(result), 200
 
+    except FileTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ExtractionTimeout as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -562,6 +1481,30 @@ def root():
 def health():
     return jsonify({'status': 'ok', 'service': 'SmartDash AI Engine'}), 200
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Result cache hit/miss counters. Counters are per worker process; the
+    entry count reflects the shared store for the file and redis backends.
+    """
+    return jsonify(result_cache.stats()), 200
+
+@app.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    """
+    Active and queued requests per admission pool of this worker, plus
+    the background report jobs it has in flight.
+    """
+    return jsonify({'pools': admission.stats(), 'report_jobs': report_jobs.stats()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics (see metrics.py): request and stage latencies,
+    payload sizes, series lengths and in-flight requests.
+    """
+    return metrics_response()
+
 
 if __name__ == '__main__':
     import os
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: rolling z-scores as a Python loop over windows vs the
+cumulative-sum pass in anomalies.py, for many categories at once.
+
+Checks that both give the same statistics on random data, that flat
+stretches are never flagged (a constant series has no anomalies, and a
+spike or a step out of a flat run flags the jump and nothing before it),
+and that noisy series far from zero, stepping between levels or ramping,
+flag the same points as a direct per-window standard deviation.
+
+Run from ai_engine/:  python benchmarks/bench_anomalies.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from anomalies import flag_anomalies, rolling_stats  # noqa: E402
+from trend import pack_series  # noqa: E402
+
+WINDOW = 20
+THRESHOLD = 3.0
+
+
+def loop_z(values, window):
+    z = np.full(len(values), np.nan)
+    for t in range(window, len(values)):
+        recent = values[t - window:t]
+        std = np.std(recent, ddof=1)
+        if std > 0:
+            z[t] = (values[t] - recent.mean()) / std
+        else:
+            z[t] = 0.0 if values[t] == recent[0] else np.sign(values[t] - recent[0]) * np.inf
+    return z
+
+
+def flagged(series, window=WINDOW):
+    packed = pack_series(series)
+    points, _ = flag_anomalies(rolling_stats(packed, window), THRESHOLD, packed.starts)
+    return points.tolist()
+
+
+def check_flat_runs():
+    assert flagged([np.full(200, 0.1)]) == []
+    assert flagged([np.full(200, 1e6 + 0.3)]) == []
+    assert flagged([np.r_[np.zeros(50), 3, np.zeros(50)]]) == [50]
+    assert flagged([np.r_[np.ones(30), 50, np.ones(5)]], window=10) == [30]
+    # A step out of a flat run: the jump itself, never the flat points before it
+    step = flagged([np.r_[np.full(40, 7.3), np.full(40, 9.1)]])
+    assert step and step[0] == 40, step
+
+
+def reference_flagged(values, window=WINDOW):
+    windows = sliding_window_view(values, window)[:-1]
+    z = (values[window:] - windows.mean(axis=1)) / windows.std(axis=1, ddof=1)
+    return (np.flatnonzero(np.abs(z) >= THRESHOLD) + window).tolist()
+
+
+def check_level_changes():
+    rng = np.random.default_rng(1)
+    n = 100_000
+    noise = rng.normal(0, 5, n)
+    cases = {
+        'step': np.r_[np.full(n // 2, 1e6), np.full(n // 2, 2e6)] + noise,
+        'ramp': 1e6 + 10.0 * np.arange(n) + noise,
+        'high level': 1e9 + noise,
+    }
+    for name, values in cases.items():
+        assert flagged([values]) == reference_flagged(values), name
+
+
+def main():
+    check_flat_runs()
+    check_level_changes()
+    rng = np.random.default_rng(0)
+    print(f"{'series':>7} {'points':>8} {'python (ms)':>12} {'cumsum (ms)':>12} {'speedup':>8}")
+    for k, n in ((10, 1000), (100, 1000), (10, 20_000)):
+        series = [rng.normal(100, 10, n) for _ in range(k)]
+        series[0][n // 2] += 200
+        fast = rolling_stats(series, WINDOW).z
+        slow = np.concatenate([loop_z(s, WINDOW) for s in series])
+        np.testing.assert_allclose(fast, slow, rtol=1e-6, atol=1e-6, equal_nan=True)
+
+        t_py = min(timeit.repeat(lambda: [loop_z(s, WINDOW) for s in series], number=1, repeat=3))
+        t_np = min(timeit.repeat(lambda: rolling_stats(series, WINDOW), number=1, repeat=3))
+        print(f"{k:>7} {n:>8} {t_py * 1e3:>12.2f} {t_np * 1e3:>12.2f} {t_py / t_np:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
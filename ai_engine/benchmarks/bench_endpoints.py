@@ -0,0 +1,215 @@
+"""
+Benchmark: AI engine routes end to end.
+
+Drives /predict, /insights, /correlations, /simulate, /predict-from-file
+and /generate-report through Flask's test client with generated workloads:
+series of 10 to 10^6 points, 1 to 1000 categories, and TXT / PDF uploads
+of increasing size. For each case it reports p50 / p99 latency, throughput
+(requests per second over the timed runs) and the peak memory allocated
+while handling one request, traced with tracemalloc (numpy arrays
+included) on an extra untimed run so tracing does not skew the latencies.
+The result cache is disabled so every request does the full work.
+
+Baselines are kept in benchmarks/baselines.json, keyed by case name:
+
+    python benchmarks/bench_endpoints.py --save         # record baselines
+    python benchmarks/bench_endpoints.py --check        # fail on regressions
+
+--check exits with status 1 when a case's p50 is more than --threshold
+(default 0.25, i.e. 25%) slower than its baseline, or its peak allocation
+is more than --mem-threshold (default 0.25) plus MEM_SLACK_MB above its
+baseline; the slack keeps tiny allocations from tripping the check on
+noise. Baselines are only comparable on the machine that recorded them.
+--quick drops the largest workloads; --only runs the cases whose name
+contains the given text.
+
+Run from ai_engine/:  python benchmarks/bench_endpoints.py
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+os.environ['RESULT_CACHE_BACKEND'] = 'none'
+# Keep the benchmark's stores out of the real models directory.
+os.chdir(tempfile.mkdtemp(prefix='smartdash-bench-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as engine  # noqa: E402
+
+MEM_SLACK_MB = 1.0
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+
+def series(rng, n):
+    return np.round(np.cumsum(rng.normal(0.5, 3.0, n)) + 100, 4)
+
+
+def columnar(values):
+    return {'values': values.tolist(), 'labels': [f'Day {i}' for i in range(len(values))]}
+
+
+def txt_upload(rng, lines):
+    values = series(rng, lines)
+    return '\n'.join(f'Day {i}: {v}' for i, v in enumerate(values.tolist())).encode('utf-8')
+
+
+def pdf_upload(rng, pages, lines_per_page=40):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    values = series(rng, pages * lines_per_page).tolist()
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        y = 750
+        for i in range(page * lines_per_page, (page + 1) * lines_per_page):
+            p.drawString(50, y, f'Day {i}: {values[i]}')
+            y -= 18
+        p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def json_case(path, body):
+    encoded = json.dumps(body)
+    return lambda client: client.post(path, data=encoded, content_type='application/json')
+
+
+def upload_case(filename, content):
+    def run(client):
+        return client.post('/predict-from-file', data={'file': (io.BytesIO(content), filename)},
+                           content_type='multipart/form-data')
+    return run
+
+
+def workloads(quick):
+    """Yields (name, request function, repeat) for every benchmark case."""
+    rng = np.random.default_rng(0)
+    lengths = (10, 1_000, 100_000) if quick else (10, 1_000, 100_000, 1_000_000)
+    category_counts = (1, 10, 100) if quick else (1, 10, 100, 1000)
+
+    for n in lengths:
+        repeat = 30 if n <= 1_000 else (10 if n <= 100_000 else 3)
+        values = series(rng, n)
+        yield f'predict n={n}', json_case('/predict', columnar(values)), repeat
+        yield f'simulate n={n}', json_case('/simulate', {**columnar(values), 'multiplier': 1.2}), repeat
+
+    for k in category_counts:
+        repeat = 20 if k <= 100 else 5
+        categories = {f'Category {c}': columnar(series(rng, 200)) for c in range(k)}
+        yield f'insights k={k}', json_case('/insights', {'categories': categories}), repeat
+        if k > 1:
+            yield f'correlations k={k}', json_case('/correlations', {'categories': categories}), repeat
+
+    for lines in ((1_000, 100_000) if quick else (1_000, 100_000, 1_000_000)):
+        yield f'upload txt lines={lines}', upload_case('data.txt', txt_upload(rng, lines)), 10 if lines < 1_000_000 else 3
+    for pages in ((5, 50) if quick else (5, 50, 200)):
+        yield f'upload pdf pages={pages}', upload_case('data.pdf', pdf_upload(rng, pages)), 5 if pages <= 50 else 2
+
+    for count in (10, 1000):
+        report = {
+            'global_summary': 'Revenue grew steadily while costs stayed flat. ' * 20,
+            'insights': [{'category': f'Category {i}', 'trend': 'upward',
+                          'message': 'Values increased 12.5% over the period and are expected to keep rising.'}
+                         for i in range(count)],
+        }
+        yield f'report insights={count}', json_case('/generate-report', report), 10 if count <= 10 else 3
+
+
+def peak_alloc_mb(client, request_fn):
+    """Peak memory allocated above the starting point while handling one request."""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        request_fn(client)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - baseline) / (1024 * 1024)
+
+
+def run_case(client, request_fn, repeat):
+    response = request_fn(client)  # warm-up
+    assert response.status_code == 200, response.get_data(as_text=True)[:200]
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = request_fn(client)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)[:200]
+    latencies = np.array(latencies)
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3),
+        'rps': round(len(latencies) / float(latencies.sum()), 2),
+        'peak_alloc_mb': round(peak_alloc_mb(client, request_fn), 1),
+    }
+
+
+def load_baselines():
+    try:
+        with open(BASELINES_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true', help='skip the largest workloads')
+    parser.add_argument('--only', help='run only cases whose name contains this text')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--check', action='store_true', help='exit 1 if a case regressed against its baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed p50 slowdown (default 0.25)')
+    parser.add_argument('--mem-threshold', type=float, default=0.25,
+                        help='allowed peak allocation growth (default 0.25)')
+    args = parser.parse_args()
+
+    client = engine.app.test_client()
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+
+    print(f"{'case':<28} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>9} {'alloc MB':>9} {'vs base':>8}")
+    for name, request_fn, repeat in workloads(args.quick):
+        if args.only and args.only not in name:
+            continue
+        result = run_case(client, request_fn, repeat)
+        results[name] = result
+
+        change = ''
+        baseline = baselines.get(name)
+        if baseline:
+            ratio = result['p50_ms'] / baseline['p50_ms'] - 1
+            change = f'{ratio:+.0%}'
+            if ratio > args.threshold:
+                regressions.append((name, 'p50', baseline['p50_ms'], result['p50_ms'], 'ms'))
+            if 'peak_alloc_mb' in baseline:
+                allowed = baseline['peak_alloc_mb'] * (1 + args.mem_threshold) + MEM_SLACK_MB
+                if result['peak_alloc_mb'] > allowed:
+                    regressions.append((name, 'peak alloc', baseline['peak_alloc_mb'], result['peak_alloc_mb'], 'MB'))
+        print(f"{name:<28} {result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+              f"{result['rps']:>9.1f} {result['peak_alloc_mb']:>9.1f} {change:>8}")
+
+    if args.save:
+        baselines.update(results)
+        with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved {len(results)} baselines to {BASELINES_PATH}")
+
+    if args.check and regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for name, metric, before, after, unit in regressions:
+            print(f"  {name} {metric}: {before:.2f} {unit} -> {after:.2f} {unit}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
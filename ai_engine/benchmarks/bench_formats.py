@@ -0,0 +1,70 @@
+"""
+Benchmark: request formats for /predict.
+
+Times a POST to /predict through Flask's test client for the same series
+sent as the original list of {'value', 'label'} dicts, as columnar JSON,
+as MessagePack with raw float64 bytes, and as a .npy body. The dict and
+columnar JSON cases are run with both the stdlib and orjson providers.
+The result cache is disabled so every request does the full work.
+
+Run from ai_engine/:  python benchmarks/bench_formats.py
+"""
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ['RESULT_CACHE_BACKEND'] = 'none'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as engine  # noqa: E402
+import payloads  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+
+def time_post(client, body, content_type, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post('/predict', data=body, content_type=content_type)
+        best = min(best, time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return best
+
+
+def bodies(values):
+    labels = [f'Day {i}' for i in range(len(values))]
+    yield 'json dicts', json.dumps({'data': [{'value': v, 'label': l} for v, l in zip(values.tolist(), labels)]}), 'application/json'
+    yield 'json columnar', json.dumps({'values': values.tolist(), 'labels': labels}), 'application/json'
+    if payloads.msgpack is not None:
+        yield 'msgpack f64', payloads.msgpack.packb({'values': values.astype('<f8').tobytes()}), 'application/msgpack'
+    buf = io.BytesIO()
+    np.save(buf, values)
+    yield 'npy', buf.getvalue(), 'application/x-npy'
+
+
+def main():
+    rng = np.random.default_rng(0)
+    client = engine.app.test_client()
+    providers = [('stdlib', DefaultJSONProvider(engine.app))]
+    if payloads.OrjsonProvider is not None:
+        providers.append(('orjson', payloads.OrjsonProvider(engine.app)))
+
+    print(f"{'points':>9} {'format':<16} {'provider':<8} {'body (KB)':>10} {'ms':>9}")
+    for n in (10_000, 100_000, 1_000_000):
+        values = np.cumsum(rng.normal(0.5, 3.0, n))
+        repeat = 5 if n < 1_000_000 else 2
+        for name, body, content_type in bodies(values):
+            for provider_name, provider in providers:
+                if content_type != 'application/json' and provider_name != 'stdlib':
+                    continue
+                engine.app.json = provider
+                elapsed = time_post(client, body, content_type, repeat)
+                label = provider_name if content_type == 'application/json' else '-'
+                print(f"{n:>9} {name:<16} {label:<8} {len(body) / 1024:>10.0f} {elapsed * 1e3:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
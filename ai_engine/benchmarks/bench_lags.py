@@ -0,0 +1,60 @@
+"""
+Micro-benchmark: lag scan for /correlations, Python loop over pairs and
+lags vs the batched scan in correlation.lagged_stats (an FFT per pair,
+or one matrix product per lag when max_lag is small).
+
+Checks both find the same best lag and correlation for every pair.
+
+Run from ai_engine/:  python benchmarks/bench_lags.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from correlation import lagged_stats  # noqa: E402
+
+
+def loop_scan(series, max_lag):
+    best = {}
+    for i in range(len(series)):
+        for j in range(i + 1, len(series)):
+            n = min(len(series[i]), len(series[j]))
+            a = series[i][:n] - series[i][:n].mean()
+            b = series[j][:n] - series[j][:n].mean()
+            norm = np.sqrt((a @ a) * (b @ b))
+            window = min(max_lag, n - 2)
+            scores = {k: (a[:n - k] @ b[k:] if k >= 0 else a[-k:] @ b[:n + k]) / norm
+                      for k in range(-window, window + 1)}
+            lag = max(sorted(scores, key=lambda k: (abs(k), k)), key=lambda k: abs(scores[k]))
+            best[(i, j) if lag >= 0 else (j, i)] = (abs(lag), scores[lag])
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'categories':>10} {'points':>7} {'max_lag':>8} {'loop (s)':>9} {'batch (s)':>10} {'speedup':>8}")
+    for k, n, max_lag in ((20, 200, 20), (50, 1000, 30), (100, 1000, 30), (40, 20_000, 3)):
+        series = [np.cumsum(rng.normal(size=n)) for _ in range(k)]
+
+        start = time.perf_counter()
+        expected = loop_scan(series, max_lag)
+        t_loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats = lagged_stats(series, max_lag)
+        t_fft = time.perf_counter() - start
+
+        actual = {(s, t): (lag, corr) for s, t, lag, corr in
+                  zip(stats.source.tolist(), stats.target.tolist(), stats.lag.tolist(), stats.corr.tolist())}
+        assert actual.keys() == expected.keys()
+        for pair, (lag, corr) in expected.items():
+            assert actual[pair][0] == lag
+            np.testing.assert_allclose(actual[pair][1], corr, atol=1e-9)
+        print(f"{k:>10} {n:>7} {max_lag:>8} {t_loop:>9.3f} {t_fft:>10.3f} {t_loop / t_fft:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Micro-benchmark: exponential smoothing as a plain Python recurrence vs the
+lfilter-based fit in smoothing.py, plus the cost of the grid search and of
+folding one new point into a stored fit.
+
+Checks that both recurrences give the same one-step errors and final state.
+
+Run from ai_engine/:  python benchmarks/bench_smoothing.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smoothing import _recurse, _run, fit_smoothing, initial_state, update_smoothing  # noqa: E402
+
+PARAMS = (0.3, 0.1, 0.2)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'n':>9} {'m':>3} {'python (ms)':>12} {'lfilter (ms)':>13} {'speedup':>8} "
+          f"{'fit+search (ms)':>16} {'update (us)':>12}")
+    for n in (365, 5000, 100_000, 1_000_000):
+        for m in (1, 12):
+            t = np.arange(n)
+            y = np.cumsum(rng.normal(0.2, 1.0, n)) + 10 * np.sin(2 * np.pi * t / 12)
+            params = PARAMS if m > 1 else PARAMS[:2] + (0.0,)
+            start = initial_state(y, m)
+
+            slow_errors, slow_state = _recurse(y, *params, *start)
+            fast_errors, fast_state = _run(y, *params, *start)
+            np.testing.assert_allclose(fast_errors, slow_errors, rtol=1e-6, atol=1e-6)
+            np.testing.assert_allclose(fast_state[:2], slow_state[:2], rtol=1e-6, atol=1e-6)
+            np.testing.assert_allclose(fast_state[2], slow_state[2], rtol=1e-6, atol=1e-6)
+
+            number = 20 if n <= 5000 else 1
+            t_py = min(timeit.repeat(lambda: _recurse(y, *params, *start), number=number, repeat=3)) / number
+            t_lf = min(timeit.repeat(lambda: _run(y, *params, *start), number=number, repeat=3)) / number
+            t_fit = min(timeit.repeat(lambda: fit_smoothing(y, m), number=1, repeat=3))
+            fit = fit_smoothing(y, m)
+            t_update = min(timeit.repeat(lambda: update_smoothing(fit, [1.0]), number=200, repeat=3)) / 200
+            print(f"{n:>9} {m:>3} {t_py * 1e3:>12.2f} {t_lf * 1e3:>13.2f} {t_py / t_lf:>7.1f}x "
+                  f"{t_fit * 1e3:>16.2f} {t_update * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Micro-benchmark: sklearn LinearRegression vs the closed-form trend fit.
+
+Times the per-request work of /predict (fit, 3-step forecast, R^2) for a
+few series lengths and checks both paths agree.
+
+Needs scikit-learn, which the engine itself no longer installs:
+    pip install -r benchmarks/requirements.txt
+
+Run from ai_engine/:  python benchmarks/bench_trend.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trend import fit_trend, forecast  # noqa: E402
+
+
+def sklearn_predict(values):
+    X = np.arange(len(values)).reshape(-1, 1)
+    y = np.array(values, dtype=float)
+    model = LinearRegression()
+    model.fit(X, y)
+    future_X = np.arange(len(values), len(values) + 3).reshape(-1, 1)
+    return model.predict(future_X), model.score(X, y), model.coef_[0], model.intercept_
+
+
+def closed_form_predict(values):
+    fit = fit_trend(values)
+    return forecast(fit, 3), fit.r2, fit.slope, fit.intercept
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'n':>8} {'sklearn (us)':>14} {'closed form (us)':>18} {'speedup':>9}")
+    for n in (5, 12, 50, 365, 5000):
+        values = list(np.cumsum(rng.normal(1.0, 5.0, n)) + 100)
+
+        expected = sklearn_predict(values)
+        actual = closed_form_predict(values)
+        np.testing.assert_allclose(actual[0], expected[0], rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(actual[1:], expected[1:], rtol=1e-9, atol=1e-9)
+
+        number = 2000 if n < 1000 else 200
+        t_sk = min(timeit.repeat(lambda: sklearn_predict(values), number=number, repeat=3)) / number
+        t_cf = min(timeit.repeat(lambda: closed_form_predict(values), number=number, repeat=3)) / number
+        print(f"{n:>8} {t_sk * 1e6:>14.1f} {t_cf * 1e6:>18.1f} {t_sk / t_cf:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
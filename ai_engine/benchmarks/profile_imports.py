@@ -0,0 +1,85 @@
+"""
+Import-time profile of the AI engine.
+
+Imports `app` in a fresh interpreter with `python -X importtime` and
+reports the total startup time, the slowest top-level imports, and which
+of the lazily loaded libraries (app.HEAVY_MODULES) were pulled in at
+startup anyway. Then times a /health request on the cold app and the
+cost of preload_heavy_modules().
+
+Run from ai_engine/:  python benchmarks/profile_imports.py [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+client = app.app.test_client()
+start = time.perf_counter()
+assert client.get('/health').status_code == 200
+health = time.perf_counter() - start
+loaded = [m for m in app.HEAVY_MODULES if m in sys.modules]
+start = time.perf_counter()
+app.preload_heavy_modules()
+preload = time.perf_counter() - start
+print(f'RESULT {imported} {health} {preload} {",".join(loaded)}')
+"""
+
+
+def parse_importtime(stderr):
+    """Returns [(cumulative us, depth, module)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--top', type=int, default=15, help='number of imports to list')
+    args = parser.parse_args()
+
+    env = {**os.environ, 'PYTHONPATH': ENGINE_DIR, 'RESULT_CACHE_BACKEND': 'none'}
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=tempfile.mkdtemp(prefix='smartdash-imports-'), env=env,
+        capture_output=True, text=True, check=True,
+    )
+    result = next(line for line in proc.stdout.splitlines() if line.startswith('RESULT'))
+    _, imported, health, preload, loaded = (result.split(' ') + [''])[:5]
+
+    rows = parse_importtime(proc.stderr)
+    # importtime lists a module after everything it imported, so the app's
+    # imports are the rows between the previous top-level module and 'app'.
+    app_index = next(i for i, row in enumerate(rows) if row[2] == 'app')
+    app_row = rows[app_index]
+    first = app_index
+    while first > 0 and rows[first - 1][1] > app_row[1]:
+        first -= 1
+    children = [row for row in rows[first:app_index] if row[1] == app_row[1] + 1]
+    top_level = sorted(children, reverse=True)[:args.top]
+
+    print(f"import app: {float(imported) * 1000:.0f} ms wall, {app_row[0] / 1000:.0f} ms in -X importtime")
+    print(f"\n{'cumulative ms':>14}  module")
+    for cumulative_us, _, name in top_level:
+        print(f"{cumulative_us / 1000:>14.1f}  {name}")
+
+    print(f"\nheavy modules loaded at startup: {loaded or 'none'}")
+    print(f"first /health on the cold app: {float(health) * 1000:.1f} ms")
+    print(f"preload_heavy_modules(): {float(preload) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+Memory-mapped, columnar on-disk store for raw series points.
+
+Each series lives in its own directory under MODELS_DIR/columns:
+
+    meta.json          id, length, capacity, whether timestamps are kept
+    values.f64         float64 values, preallocated to `capacity`
+    timestamps.i64     int64 epoch milliseconds (same capacity)
+    label_offsets.i64  end offset of each label in labels.bin
+    labels.bin         UTF-8 labels, concatenated
+
+The numeric columns are read through np.memmap, so routes work on
+zero-copy views and every gunicorn worker on the host shares the same
+pages via the OS page cache. Appends take an exclusive lock, write the
+new points past the current length and only then publish the new length
+in meta.json (atomic rename), so readers always see a consistent prefix.
+
+compact() writes the rewritten columns as a new generation of files
+(values.f64.<N>, ...) and switches to it with the same single meta.json
+rename, so a reader sees either the old files or the new ones, never a
+mix. The previous generation is kept until the next compaction for
+readers that read meta.json just before the switch.
+
+locked() holds a series' lock across other work, so callers can keep
+derived state (the running statistics in series_store.py) in step with
+the raw points.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from series_store import validate_series_id
+
+INITIAL_CAPACITY = 1024
+MAX_OPEN_MAPS = 256
+_COLUMNS = (('values.f64', np.float64), ('timestamps.i64', np.int64), ('label_offsets.i64', np.int64))
+_FILES = tuple(name for name, _ in _COLUMNS) + ('labels.bin',)
+_FILE_STEMS = {name.split('.')[0] for name in _FILES}
+
+
+def to_epoch_ms(value):
+    """Converts an ISO-8601 string or a number of epoch ms to epoch ms."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def from_epoch_ms(value):
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class ColumnStore:
+    """One set of memory-mapped column files per series id."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._maps = OrderedDict()
+        # Series directories whose lock the current thread holds
+        self._held = threading.local()
+
+    def _series_dir(self, series_id):
+        validate_series_id(series_id)
+        digest = hashlib.blake2b(series_id.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    @contextmanager
+    def _locked(self, series_dir):
+        held = self._held.__dict__.setdefault('dirs', set())
+        if series_dir in held:
+            yield
+            return
+        os.makedirs(series_dir, exist_ok=True)
+        with open(os.path.join(series_dir, 'lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            held.add(series_dir)
+            try:
+                yield
+            finally:
+                held.discard(series_dir)
+
+    def locked(self, series_id):
+        """
+        Holds the exclusive lock of a series. append() and compact() called
+        inside it by the same thread reuse it.
+        """
+        return self._locked(self._series_dir(series_id))
+
+    @staticmethod
+    def _file(meta, name):
+        # Generation 0 (never compacted) uses the plain file names
+        generation = meta.get('generation', 0)
+        return f'{name}.{generation}' if generation else name
+
+    def _read_meta(self, series_dir):
+        try:
+            with open(os.path.join(series_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, series_dir, meta):
+        tmp_path = os.path.join(series_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(series_dir, 'meta.json'))
+
+    def _column(self, series_dir, name, dtype, mode='r'):
+        """
+        Returns a memmap of a whole column file. Read-only maps are cached
+        per process and re-opened when the file is replaced or grows.
+        """
+        path = os.path.join(series_dir, name)
+        if mode != 'r':
+            return np.memmap(path, dtype=dtype, mode=mode)
+        st = os.stat(path)
+        if st.st_size == 0:
+            return np.empty(0, dtype=dtype)
+        cached = self._maps.get(path)
+        if cached is not None and cached[0] == (st.st_ino, st.st_size):
+            self._maps.move_to_end(path)
+            return cached[1]
+        column = np.memmap(path, dtype=dtype, mode='r')
+        self._maps[path] = ((st.st_ino, st.st_size), column)
+        while len(self._maps) > MAX_OPEN_MAPS:
+            self._maps.popitem(last=False)
+        return column
+
+    def _resize(self, series_dir, meta, capacity):
+        for name, dtype in _COLUMNS:
+            with open(os.path.join(series_dir, self._file(meta, name)), 'ab') as f:
+                f.truncate(capacity * np.dtype(dtype).itemsize)
+
+    def meta(self, series_id):
+        """Returns the series metadata, or None if the series does not exist."""
+        return self._read_meta(self._series_dir(series_id))
+
+    def append(self, series_id, values, labels=None, timestamps=None):
+        """
+        Appends points to a series, creating it if needed. Timestamps must
+        be given for every append or for none, and must not go backwards.
+        Returns the updated metadata.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        count = values.shape[0]
+        if labels is not None and len(labels) != count:
+            raise ValueError('labels must have one entry per value')
+        if timestamps is not None and len(timestamps) != count:
+            raise ValueError('timestamps must have one entry per value')
+
+        series_dir = self._series_dir(series_id)
+        with self._locked(series_dir):
+            meta = self._read_meta(series_dir)
+            if meta is None:
+                meta = {'id': series_id, 'length': 0, 'capacity': 0,
+                        'label_bytes': 0, 'has_timestamps': timestamps is not None}
+            if meta['has_timestamps'] != (timestamps is not None):
+                raise ValueError('timestamps must be given for every append to this series, or for none')
+
+            length = meta['length']
+            ts = None
+            if timestamps is not None:
+                ts = np.array([to_epoch_ms(t) for t in timestamps], dtype=np.int64)
+                previous = self._column(series_dir, self._file(meta, 'timestamps.i64'), np.int64)[length - 1] if length else ts[:1]
+                if np.any(np.diff(np.concatenate([np.atleast_1d(previous), ts])) < 0):
+                    raise ValueError('timestamps must be non-decreasing')
+
+            if length + count > meta['capacity']:
+                capacity = max(INITIAL_CAPACITY, meta['capacity'])
+                while capacity < length + count:
+                    capacity *= 2
+                self._resize(series_dir, meta, capacity)
+                meta['capacity'] = capacity
+
+            label_bytes = [(label if label is not None else '').encode('utf-8') for label in (labels or [''] * count)]
+            with open(os.path.join(series_dir, self._file(meta, 'labels.bin')), 'ab') as f:
+                f.seek(meta['label_bytes'])
+                f.truncate()
+                f.write(b''.join(label_bytes))
+            ends = meta['label_bytes'] + np.cumsum([len(b) for b in label_bytes], dtype=np.int64)
+
+            stop = length + count
+            columns = (('values.f64', np.float64, values), ('label_offsets.i64', np.int64, ends))
+            if ts is not None:
+                columns += (('timestamps.i64', np.int64, ts),)
+            for name, dtype, data in columns:
+                column = self._column(series_dir, self._file(meta, name), dtype, mode='r+')
+                column[length:stop] = data
+                column.flush()
+
+            meta['length'] = stop
+            meta['label_bytes'] = int(ends[-1]) if count else meta['label_bytes']
+            self._write_meta(series_dir, meta)
+        return meta
+
+    def _index_range(self, series_dir, meta, start=None, stop=None, date_from=None, date_to=None):
+        length = meta['length']
+        lo, hi, _ = slice(start, stop).indices(length)
+        if date_from is not None or date_to is not None:
+            if not meta['has_timestamps']:
+                raise ValueError('This series has no timestamps to select a date range by')
+            timestamps = self._column(series_dir, self._file(meta, 'timestamps.i64'), np.int64)[:length]
+            if date_from is not None:
+                lo = max(lo, int(np.searchsorted(timestamps, to_epoch_ms(date_from), side='left')))
+            if date_to is not None:
+                hi = min(hi, int(np.searchsorted(timestamps, to_epoch_ms(date_to), side='right')))
+        return lo, max(lo, hi)
+
+    def values(self, series_id, start=None, stop=None, date_from=None, date_to=None):
+        """
+        Returns a read-only, zero-copy view of the selected values, by index
+        range (`start`/`stop`, slice semantics) and/or date range (inclusive).
+        Returns None if the series does not exist.
+        """
+        series_dir = self._series_dir(series_id)
+        meta = self._read_meta(series_dir)
+        if meta is None:
+            return None
+        lo, hi = self._index_range(series_dir, meta, start, stop, date_from, date_to)
+        return self._column(series_dir, self._file(meta, 'values.f64'), np.float64)[lo:hi]
+
+    def read(self, series_id, start=None, stop=None, date_from=None, date_to=None):
+        """
+        Returns {'start', 'values', 'labels', 'timestamps'} for the selected
+        range as plain lists, or None if the series does not exist.
+        """
+        series_dir = self._series_dir(series_id)
+        meta = self._read_meta(series_dir)
+        if meta is None:
+            return None
+        lo, hi = self._index_range(series_dir, meta, start, stop, date_from, date_to)
+
+        values = self._column(series_dir, self._file(meta, 'values.f64'), np.float64)[lo:hi]
+        offsets = self._column(series_dir, self._file(meta, 'label_offsets.i64'), np.int64)
+        ends = offsets[lo:hi]
+        label_start = int(offsets[lo - 1]) if lo else 0
+        with open(os.path.join(series_dir, self._file(meta, 'labels.bin')), 'rb') as f:
+            f.seek(label_start)
+            blob = f.read(int(ends[-1]) - label_start if hi > lo else 0)
+        bounds = np.concatenate([[0], ends - label_start]).tolist()
+        labels = [blob[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+        timestamps = None
+        if meta['has_timestamps']:
+            ts = self._column(series_dir, self._file(meta, 'timestamps.i64'), np.int64)[lo:hi]
+            timestamps = [from_epoch_ms(t) for t in ts.tolist()]
+
+        return {'start': lo, 'values': values.tolist(), 'labels': labels, 'timestamps': timestamps}
+
+    def compact(self, series_id, keep_last=None):
+        """
+        Rewrites a series' files at their exact size, optionally keeping only
+        the last `keep_last` points, as a new generation of files that one
+        meta.json rename switches to (see the module docstring).
+        Returns the updated metadata, or None if the series does not exist.
+        """
+        series_dir = self._series_dir(series_id)
+        with self._locked(series_dir):
+            meta = self._read_meta(series_dir)
+            if meta is None:
+                return None
+            length = meta['length']
+            drop = max(length - keep_last, 0) if keep_last is not None else 0
+            new_length = length - drop
+
+            ends = np.array(self._column(series_dir, self._file(meta, 'label_offsets.i64'), np.int64)[:length])
+            label_start = int(ends[drop - 1]) if drop else 0
+            with open(os.path.join(series_dir, self._file(meta, 'labels.bin')), 'rb') as f:
+                f.seek(label_start)
+                blob = f.read(meta['label_bytes'] - label_start)
+
+            old_generation = meta.get('generation', 0)
+            compacted = {**meta, 'generation': old_generation + 1,
+                         'length': new_length, 'capacity': new_length, 'label_bytes': len(blob)}
+            rewritten = {
+                'values.f64': np.array(self._column(series_dir, self._file(meta, 'values.f64'), np.float64)[drop:length]),
+                'timestamps.i64': np.array(self._column(series_dir, self._file(meta, 'timestamps.i64'), np.int64)[drop:length]),
+                'label_offsets.i64': ends[drop:] - label_start,
+                'labels.bin': blob,
+            }
+            for name, data in rewritten.items():
+                with open(os.path.join(series_dir, self._file(compacted, name)), 'wb') as f:
+                    f.write(data if isinstance(data, bytes) else data.tobytes())
+            self._write_meta(series_dir, compacted)
+
+            # Keep the generation just replaced for readers still on it
+            live = {self._file(generation_meta, name)
+                    for generation_meta in (meta, compacted) for name in _FILES}
+            for entry in os.listdir(series_dir):
+                if entry.split('.')[0] in _FILE_STEMS and entry not in live:
+                    os.remove(os.path.join(series_dir, entry))
+        return compacted
+
+    def delete(self, series_id):
+        """Removes a series' files. Returns False if it did not exist."""
+        series_dir = self._series_dir(series_id)
+        if not os.path.isdir(series_dir):
+            return False
+        # locked() may have created the directory of a series never written
+        existed = self._read_meta(series_dir) is not None
+        shutil.rmtree(series_dir, ignore_errors=True)
+        return existed
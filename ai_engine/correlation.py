@@ -0,0 +1,252 @@
+"""
+Matrix-based cross-category correlation.
+
+Each pair of categories is compared over their common prefix (the first
+min(len_a, len_b) points), as the /correlations route always has. Pairs are
+grouped by that common length so every group is one aligned value matrix:
+its correlations and regression slopes come from a single matrix product
+instead of a Python loop with a regression fit per pair.
+
+lagged_stats() scans a window of lags for every pair the same way: each
+group's rows are transformed once with a real FFT, and every pair's
+cross-correlation at all lags is one inverse FFT of the product of two
+spectra, done in chunks of pairs.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+
+class PairStats(NamedTuple):
+    source: np.ndarray       # index of the earlier category in each pair ('from')
+    target: np.ndarray       # index of the later category ('to')
+    corr: np.ndarray         # Pearson correlation
+    slope: np.ndarray        # OLS slope of target on source
+    source_mean: np.ndarray
+    target_mean: np.ndarray
+
+
+class LagStats(NamedTuple):
+    source: np.ndarray       # index of the leading category in each pair ('from')
+    target: np.ndarray       # index of the following category ('to')
+    lag: np.ndarray          # periods by which source leads target (>= 0)
+    corr: np.ndarray         # cross-correlation at that lag
+    slope: np.ndarray        # regression slope of target on source at that lag
+    source_mean: np.ndarray
+    target_mean: np.ndarray
+
+
+# Values (pairs x points) materialised per batch in lagged_stats, to bound memory
+LAG_CHUNK_VALUES = 1 << 21
+
+
+def _empty_stats():
+    empty_idx = np.empty(0, dtype=np.int64)
+    empty = np.empty(0)
+    return PairStats(empty_idx, empty_idx, empty, empty, empty, empty)
+
+
+def _empty_lag_stats():
+    empty_idx = np.empty(0, dtype=np.int64)
+    empty = np.empty(0)
+    return LagStats(empty_idx, empty_idx, empty_idx, empty, empty, empty, empty)
+
+
+def _padded_matrix(series):
+    """
+    (lengths, matrix) with one NaN-padded row per series. A pair never uses
+    more than its shorter side, so rows are cut to the second-longest
+    length rather than padded out to the longest.
+    """
+    lengths = np.fromiter((len(s) for s in series), dtype=np.int64, count=len(series))
+    width = int(np.partition(lengths, -2)[-2])
+    matrix = np.full((len(series), width), np.nan)
+    for i, values in enumerate(series):
+        matrix[i, :min(lengths[i], width)] = values[:width]
+    return lengths, matrix
+
+
+def pairwise_stats(series):
+    """
+    Computes correlation and slope for every unordered pair of series.
+    `series` is a list of 1-D value sequences with at least 2 points each.
+    Pairs where either side is constant over the common prefix are dropped,
+    matching the np.std(...) == 0 check the route used to do.
+    """
+    k = len(series)
+    if k < 2:
+        return _empty_stats()
+
+    lengths, matrix = _padded_matrix(series)
+
+    groups = []
+    for common_len in np.unique(lengths[lengths <= matrix.shape[1]]).tolist():
+        # Rows whose pairs are cut to `common_len`: the shortest side has
+        # exactly that length, the other side is at least as long.
+        members = np.flatnonzero(lengths >= common_len)
+        short = lengths[members] == common_len
+
+        block = matrix[members, :common_len]
+        means = block.mean(axis=1)
+        centered = block - means[:, None]
+        sum_sq = np.einsum('ij,ij->i', centered, centered)
+        cross = centered[short] @ centered.T
+
+        short_idx = np.flatnonzero(short)
+        row_pos, col_pos = np.divmod(np.arange(cross.size), cross.shape[1])
+        short_pos = short_idx[row_pos]
+        i, j = members[short_pos], members[col_pos]
+        # Pairs of two equally short rows show up twice; keep the i < j copy.
+        keep = (i != j) & (~short[col_pos] | (i < j))
+        keep &= (sum_sq[short_pos] > 0) & (sum_sq[col_pos] > 0)
+        if not keep.any():
+            continue
+
+        short_pos, col_pos, i, j = short_pos[keep], col_pos[keep], i[keep], j[keep]
+        cov = cross[row_pos[keep], col_pos]
+
+        # Orient every pair in category order, as the old nested loop did.
+        swap = i > j
+        src_pos = np.where(swap, col_pos, short_pos)
+        dst_pos = np.where(swap, short_pos, col_pos)
+
+        corr = np.clip(cov / np.sqrt(sum_sq[short_pos]) / np.sqrt(sum_sq[col_pos]), -1.0, 1.0)
+        groups.append(PairStats(
+            source=members[src_pos],
+            target=members[dst_pos],
+            corr=corr,
+            slope=cov / sum_sq[src_pos],
+            source_mean=means[src_pos],
+            target_mean=means[dst_pos],
+        ))
+
+    if not groups:
+        return _empty_stats()
+    return PairStats(*(np.concatenate(parts) for parts in zip(*groups)))
+
+
+def _lag_order(max_lag):
+    # 0, -1, 1, -2, 2, ...: argmax over this order prefers the shortest lag on ties
+    steps = np.arange(1, max_lag + 1)
+    return np.concatenate([[0], np.column_stack([-steps, steps]).ravel()])
+
+
+def _shifted_products(centered, lag):
+    # Entry (i, j) is sum_t x_i,t * x_j,(t+lag) over the overlap
+    n = centered.shape[1]
+    if lag >= 0:
+        return centered[:, :n - lag] @ centered[:, lag:].T
+    return centered[:, -lag:] @ centered[:, :n + lag].T
+
+
+def lagged_stats(series, max_lag):
+    """
+    Finds, for every unordered pair of series, the lag within +-max_lag at
+    which they are most strongly correlated (largest |r|).
+
+    Pairs are compared over their common prefix, as in pairwise_stats. At
+    lag k the correlation is sum_t a_t * b_(t+k) over the overlap of the
+    centered series, divided by sqrt(sum a² * sum b²) over the whole
+    prefix: the usual sample cross-correlation, which equals the Pearson
+    correlation at lag 0 and shrinks with the overlap at longer lags. Lags
+    are capped so at least 2 points overlap.
+
+    With only a few lags, each lag is one matrix product of the centered
+    series; otherwise all lags come from one FFT cross-correlation per
+    pair, in batches of at most LAG_CHUNK_VALUES values.
+
+    Each pair is oriented so the source leads: a positive lag means the
+    target follows the source that many periods later. Constant series
+    are dropped.
+    """
+    if len(series) < 2:
+        return _empty_lag_stats()
+
+    lengths, matrix = _padded_matrix(series)
+    groups = []
+    for common_len in np.unique(lengths[lengths <= matrix.shape[1]]).tolist():
+        members = np.flatnonzero(lengths >= common_len)
+        short = lengths[members] == common_len
+        # Pairs cut to this length: a short row with any other member, each
+        # pair of two short rows once. Positions follow category order.
+        pairs = short[:, None] & (~short[None, :] | np.tri(len(members), k=-1, dtype=bool).T)
+        pairs |= pairs.T
+        src_pos, dst_pos = np.nonzero(np.triu(pairs, k=1))
+
+        block = matrix[members, :common_len]
+        means = block.mean(axis=1)
+        centered = block - means[:, None]
+        sum_sq = np.einsum('ij,ij->i', centered, centered)
+        varying = (sum_sq[src_pos] > 0) & (sum_sq[dst_pos] > 0)
+        src_pos, dst_pos = src_pos[varying], dst_pos[varying]
+        if src_pos.size == 0:
+            continue
+
+        window = min(max_lag, common_len - 2)
+        lags = _lag_order(window)
+        nfft = 1 << (2 * common_len - 1).bit_length()
+        best_lag = np.zeros(src_pos.size, dtype=np.int64)
+        best_corr = np.zeros(src_pos.size)
+        if lags.size <= nfft.bit_length():
+            # Fewer lags than log2(nfft): a product per lag is cheaper than the FFT
+            norm = np.sqrt(sum_sq[src_pos] * sum_sq[dst_pos])
+            for lag in lags.tolist():
+                corr = _shifted_products(centered, lag)[src_pos, dst_pos] / norm
+                # Strictly larger only, so ties keep the shorter lag seen first
+                better = np.abs(corr) > np.abs(best_corr)
+                best_lag[better] = lag
+                best_corr[better] = corr[better]
+        else:
+            spectra = np.fft.rfft(centered, nfft, axis=1)
+            chunk = max(1, LAG_CHUNK_VALUES // nfft)
+            for lo in range(0, src_pos.size, chunk):
+                a, b = src_pos[lo:lo + chunk], dst_pos[lo:lo + chunk]
+                # Column k (mod nfft) of the inverse FFT is sum_t a_t * b_(t+k)
+                cross = np.fft.irfft(spectra[a].conj() * spectra[b], nfft, axis=1)[:, lags % nfft]
+                corr = cross / np.sqrt(sum_sq[a] * sum_sq[b])[:, None]
+                pick = np.argmax(np.abs(corr), axis=1)
+                best_lag[lo:lo + chunk] = lags[pick]
+                best_corr[lo:lo + chunk] = corr[np.arange(pick.size), pick]
+
+        # Orient every pair leader first
+        swap = best_lag < 0
+        lead_pos = np.where(swap, dst_pos, src_pos)
+        follow_pos = np.where(swap, src_pos, dst_pos)
+        best_corr = np.clip(best_corr, -1.0, 1.0)
+        groups.append(LagStats(
+            source=members[lead_pos],
+            target=members[follow_pos],
+            lag=np.abs(best_lag),
+            corr=best_corr,
+            slope=best_corr * np.sqrt(sum_sq[follow_pos] / sum_sq[lead_pos]),
+            source_mean=means[lead_pos],
+            target_mean=means[follow_pos],
+        ))
+
+    if not groups:
+        return _empty_lag_stats()
+    return LagStats(*(np.concatenate(parts) for parts in zip(*groups)))
+
+
+def top_pairs(stats, mask, top_k=None):
+    """
+    Returns indices into `stats` for the pairs selected by `mask`, strongest
+    |correlation| first (ties keep category order). With `top_k`, only the
+    k strongest are selected with a partial sort (np.partition).
+    """
+    candidates = np.flatnonzero(mask)
+    # Rank on the correlation as reported (3 decimals), like the route did.
+    strength = np.round(np.abs(stats.corr[candidates]), 3)
+
+    if top_k is not None and top_k < candidates.size:
+        if top_k <= 0:
+            return candidates[:0]
+        cutoff = np.partition(strength, candidates.size - top_k)[candidates.size - top_k]
+        # Keep every pair tied at the cutoff so the tie-break below is stable.
+        near = strength >= cutoff
+        candidates, strength = candidates[near], strength[near]
+
+    n_series = int(max(stats.source.max(initial=0), stats.target.max(initial=0))) + 1
+    pair_order = stats.source[candidates] * n_series + stats.target[candidates]
+    ranked = candidates[np.lexsort((pair_order, -strength))]
+    return ranked if top_k is None else ranked[:top_k]
@@ -0,0 +1,80 @@
+"""
+Shape-preserving downsampling of long series for charts.
+
+  lttb    Largest-Triangle-Three-Buckets: the first and last points, plus
+          from each of (target - 2) equal buckets the point forming the
+          largest triangle with the point kept from the previous bucket
+          and the average of the next one. Keeps the visual shape of
+          the line, peaks and dips included.
+  minmax  the smallest and largest point of each of target / 2 buckets,
+          plus the first and last points. Guarantees every extreme is
+          kept; cheaper, but noisier between extremes.
+
+Both return the indices of the kept points in ascending order (the x axis
+is the point index), so callers can pick labels / timestamps to go with
+them. The per-point work is all array operations: minmax is a single
+reshape and argmin / argmax, lttb loops over buckets (a few hundred), not
+points.
+"""
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+DEFAULT_POINTS = 500
+MIN_POINTS = 3
+MAX_POINTS = 100_000
+
+
+def lttb_indices(y, target):
+    n = y.shape[0]
+    # Bucket i covers the middle points edges[i]..edges[i + 1] - 1
+    edges = np.linspace(1, n - 1, target - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    # Average point of every bucket, for the bucket before it; the last
+    # bucket looks ahead to the final point instead.
+    next_x = np.append(((edges[:-1] + edges[1:] - 1) / 2.0)[1:], n - 1)
+    next_y = np.append((np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes)[1:], y[n - 1])
+
+    selected = np.empty(target, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i, (lo, hi) in enumerate(zip(edges[:-1].tolist(), edges[1:].tolist())):
+        ax, ay = float(a), y[a]
+        # Twice the area of the triangle (a, p, next average) for every p in the bucket
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - np.arange(lo, hi)) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, target):
+    n = y.shape[0]
+    buckets = max(1, (target - 2) // 2)
+    size = -(-n // buckets)
+    rows = -(-n // size)
+    # Pad the tail with the last value: a pad slot can only win where the
+    # last point itself would, and that one is always kept.
+    padded = y if rows * size == n else np.concatenate([y, np.full(rows * size - n, y[-1])])
+    grid = padded.reshape(rows, size)
+    starts = np.arange(rows) * size
+    picked = np.concatenate([[0, n - 1], starts + grid.argmin(axis=1), starts + grid.argmax(axis=1)])
+    return np.unique(np.minimum(picked, n - 1))
+
+
+def downsample_indices(values, target=DEFAULT_POINTS, method='lttb'):
+    """
+    Returns the indices of at most `target` points of `values` that keep
+    its shape (see the module docstring). Series that already fit are
+    returned whole.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method!r} (expected 'lttb' or 'minmax')")
+    target = int(target)
+    if not MIN_POINTS <= target <= MAX_POINTS:
+        raise ValueError(f'Downsampling target must be between {MIN_POINTS} and {MAX_POINTS} points')
+    y = np.asarray(values, dtype=float)
+    if y.shape[0] <= target:
+        return np.arange(y.shape[0])
+    if method == 'minmax':
+        return minmax_indices(y, target)
+    return lttb_indices(y, target)
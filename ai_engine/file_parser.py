@@ -0,0 +1,229 @@
+"""
+Streaming parser for uploaded TXT / PDF data files.
+
+Lines are read one at a time (page by page for PDFs) and each value goes
+straight into a compact float array, so memory use does not grow with the
+raw text size: only 8 bytes per extracted point are kept, plus whichever
+labels the caller asks for.
+"""
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
+import numpy as np
+
+# Matches 123, 123.45, -123.45
+NUMBER_RE = re.compile(r'[-+]?\d*\.\d+|\d+')
+
+MAX_LABEL_LENGTH = 30
+
+# PDF text extraction: documents with at least PDF_PARALLEL_MIN_PAGES pages
+# are split across a process pool of PDF_POOL_SIZE workers (1 disables it).
+PDF_POOL_SIZE = int(os.environ.get('PDF_POOL_SIZE', min(4, os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 20))
+PDF_TIMEOUT_SECONDS = float(os.environ.get('PDF_TIMEOUT_SECONDS', 120))
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+class FileTooLarge(ValueError):
+    """Raised when an upload exceeds the configured byte or point limits."""
+
+
+class ExtractionTimeout(ValueError):
+    """Raised when PDF text extraction runs past PDF_TIMEOUT_SECONDS."""
+
+
+class ParsedFile(NamedTuple):
+    values: np.ndarray  # every extracted value, in file order
+    labels: list        # labels for the last `label_tail` points (all if None)
+
+
+def _stream_size(file_stream):
+    position = file_stream.tell()
+    file_stream.seek(0, 2)
+    size = file_stream.tell()
+    file_stream.seek(position)
+    return size
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Not fork: forking a threaded worker copies locks other threads
+            # may hold. Forkserver children start from a clean process.
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_POOL_SIZE, mp_context=multiprocessing.get_context('forkserver'))
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool):
+    # A timed-out document may still be running in the pool, and a broken
+    # pool (a worker was killed) cannot take new work; stop using it, stop
+    # its processes so no page range keeps running, and let the next upload
+    # start a fresh one. Uploads still reading from it finish serially.
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """Pool worker: extracts the text of pages [start, stop)."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def _iter_pages(reader, start, deadline):
+    for i in range(start, len(reader.pages)):
+        if time.monotonic() > deadline:
+            raise ExtractionTimeout('PDF text extraction timed out')
+        yield reader.pages[i].extract_text()
+
+
+def iter_pdf_pages(file_stream):
+    """
+    Yields the text of each PDF page in order.
+
+    Small documents are extracted on the calling thread. Larger ones are
+    copied to a temporary file once and split into contiguous page ranges
+    that the process pool reads from it; the results are yielded back in
+    page order as they become available. If a pool process dies, the pool
+    is replaced for later uploads and the remaining pages are extracted
+    on the calling thread. Raises ExtractionTimeout once
+    PDF_TIMEOUT_SECONDS have elapsed.
+    """
+    from pypdf import PdfReader  # imported on first use to keep startup fast
+
+    deadline = time.monotonic() + PDF_TIMEOUT_SECONDS
+    reader = PdfReader(file_stream)
+    page_count = len(reader.pages)
+
+    if PDF_POOL_SIZE <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        yield from _iter_pages(reader, 0, deadline)
+        return
+
+    # Workers open the spooled copy by path instead of each being sent
+    # the whole document
+    file_stream.seek(0)
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as spool:
+        shutil.copyfileobj(file_stream, spool)
+        spool.flush()
+
+        # A couple of ranges per worker keeps the pool busy if pages are uneven.
+        chunk_count = min(page_count, PDF_POOL_SIZE * 2)
+        bounds = [page_count * i // chunk_count for i in range(chunk_count + 1)]
+
+        pool = _get_pdf_pool()
+        futures = []
+        done = 0
+        try:
+            for start, stop in zip(bounds, bounds[1:]):
+                futures.append(pool.submit(_extract_page_range, spool.name, start, stop))
+            for future in futures:
+                for text in future.result(timeout=max(deadline - time.monotonic(), 0)):
+                    yield text
+                    done += 1
+        except FutureTimeout:
+            _discard_pdf_pool(pool)
+            raise ExtractionTimeout('PDF text extraction timed out')
+        except BrokenProcessPool:
+            _discard_pdf_pool(pool)
+            yield from _iter_pages(reader, done, deadline)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_lines(file_stream, filename, max_bytes=None):
+    """
+    Yields the text lines of an uploaded file without materializing the
+    whole document. TXT files are read line by line; PDFs page by page.
+    """
+    try:
+        if filename.lower().endswith('.pdf'):
+            # pypdf needs random access, so the size is checked up front.
+            if max_bytes is not None and _stream_size(file_stream) > max_bytes:
+                raise FileTooLarge(f'File exceeds the {max_bytes} byte upload limit')
+            for text in iter_pdf_pages(file_stream):
+                yield from text.split('\n')
+        else:
+            # Assume text based
+            consumed = 0
+            for raw_line in file_stream:
+                consumed += len(raw_line)
+                if max_bytes is not None and consumed > max_bytes:
+                    raise FileTooLarge(f'File exceeds the {max_bytes} byte upload limit')
+                yield raw_line.decode('utf-8')
+    except (FileTooLarge, ExtractionTimeout):
+        raise
+    except Exception as e:
+        raise ValueError(f"Failed to parse file: {str(e)}")
+
+
+def _label_for(line, counter):
+    label = f"Entry {counter}"
+    parts = line.split()
+    if len(parts) > 1:
+        # Join parts except the last one (which is likely the value),
+        # cleaning up any trailing colon etc.
+        possible_label = " ".join(parts[:-1]).strip().rstrip(':,')
+        if len(possible_label) < MAX_LABEL_LENGTH:
+            label = possible_label
+    return label
+
+
+def parse_file_content(file_stream, filename, max_points=None, max_bytes=None, label_tail=None):
+    """
+    Parses PDF or TXT content to extract numerical data points.
+    Expected format: one number per line OR date,number pairs.
+    The last number on a line is its value; the text before it (if short)
+    is its label, otherwise 'Entry N'.
+
+    Returns a ParsedFile. Only the last `label_tail` labels are kept when
+    it is given. Raises FileTooLarge past `max_points` / `max_bytes`.
+    """
+    values = array('d')
+    # Labels are only worked out for the lines that are kept.
+    labelled_lines = deque(maxlen=label_tail) if label_tail is not None else []
+    counter = 1
+
+    for line in iter_lines(file_stream, filename, max_bytes):
+        line = line.strip()
+        if not line:
+            continue
+
+        matches = NUMBER_RE.findall(line)
+        if not matches:
+            continue
+
+        if max_points is not None and counter > max_points:
+            raise FileTooLarge(f'File contains more than {max_points} data points')
+
+        # Take the last number as the value
+        values.append(float(matches[-1]))
+        labelled_lines.append((line, counter))
+        counter += 1
+
+    if not values:
+        raise ValueError("No valid numerical data found in file")
+
+    labels = [_label_for(line, n) for line, n in labelled_lines]
+    return ParsedFile(np.frombuffer(values, dtype=float), labels)
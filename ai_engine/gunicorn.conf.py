@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for the AI engine (picked up automatically by
+`gunicorn app:app` when run from ai_engine/).
+
+Startup: the app is loaded once in the master (preload_app) together with
+the PDF libraries it otherwise imports lazily, and workers are forked from
+it, so they start warm and share those pages copy-on-write. Set
+GUNICORN_PRELOAD=0 to load the app in each worker instead; the libraries
+are then imported on a background thread after the worker boots.
+
+Concurrency: threaded workers (GUNICORN_THREADS per worker, default 8),
+so a worker can accept more requests than admission control lets run at
+once and answer the overflow with a fast 429 / 503 (see admission.py)
+instead of leaving it in the listen backlog.
+
+Metrics: every worker writes its Prometheus samples to
+PROMETHEUS_MULTIPROC_DIR so /metrics can report totals for the whole
+server. The directory is emptied when the server starts, and a worker's
+live gauges are dropped when it exits.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'smartdash-metrics'))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    # Runs in the master before the first workers are forked.
+    if server.cfg.preload_app:
+        import app
+        app.preload_heavy_modules()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        import app
+        app.warm_up_in_background()
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
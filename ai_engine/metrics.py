@@ -0,0 +1,176 @@
+"""
+Prometheus metrics for the AI engine, served at /metrics.
+
+  smartdash_request_duration_seconds   per route / method / status
+  smartdash_stage_duration_seconds     per stage: decode, parse, fit, simulate, downsample,
+                                       render, encode
+  smartdash_request_size_bytes         request body size per route
+  smartdash_response_size_bytes        response body size per route
+  smartdash_series_length              points per analysed series, per route
+  smartdash_requests_in_flight         requests currently being handled
+  smartdash_admission_active / _queued requests running / waiting per admission pool
+  smartdash_admission_rejected         requests turned away per pool and status
+
+Under gunicorn every worker is a separate process. When
+PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py does this), each worker
+writes its samples to memory-mapped files in that directory and /metrics
+merges them, so any worker returns the totals for the whole server.
+
+Tracing: with METRICS_TRACE=1, every response carries a Server-Timing
+header with its stage timings, and functions registered with
+add_trace_hook() are called once per request with
+(route, status, duration, stages). Stage timings are collected either
+way, so tracing only adds the header and the hook calls.
+
+prometheus_client is optional; without it the timers still feed tracing
+and /metrics answers 503.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, jsonify, request
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:  # optional: metrics are not exported without it
+    prometheus_client = None
+
+TRACE_ENABLED = os.environ.get('METRICS_TRACE', '0') == '1'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(4 ** i * 256 for i in range(11))          # 256 B .. 256 MiB
+LENGTH_BUCKETS = tuple(10 ** i for i in range(8))              # 1 .. 10^7 points
+
+_trace_hooks = []
+
+if prometheus_client is not None:
+    REQUEST_DURATION = Histogram(
+        'smartdash_request_duration_seconds', 'Request latency',
+        ('route', 'method', 'status'), buckets=LATENCY_BUCKETS)
+    STAGE_DURATION = Histogram(
+        'smartdash_stage_duration_seconds', 'Time spent in one stage of a request',
+        ('route', 'stage'), buckets=LATENCY_BUCKETS)
+    REQUEST_SIZE = Histogram(
+        'smartdash_request_size_bytes', 'Request body size', ('route',), buckets=SIZE_BUCKETS)
+    RESPONSE_SIZE = Histogram(
+        'smartdash_response_size_bytes', 'Response body size', ('route',), buckets=SIZE_BUCKETS)
+    SERIES_LENGTH = Histogram(
+        'smartdash_series_length', 'Points per analysed series', ('route',), buckets=LENGTH_BUCKETS)
+    IN_FLIGHT = Gauge(
+        'smartdash_requests_in_flight', 'Requests being handled', ('route',),
+        multiprocess_mode='livesum')
+    ADMISSION_ACTIVE = Gauge(
+        'smartdash_admission_active', 'Requests running in an admission pool', ('pool',),
+        multiprocess_mode='livesum')
+    ADMISSION_QUEUED = Gauge(
+        'smartdash_admission_queued', 'Requests waiting for an admission pool', ('pool',),
+        multiprocess_mode='livesum')
+    ADMISSION_REJECTED = Counter(
+        'smartdash_admission_rejected', 'Requests turned away by an admission pool', ('pool', 'status'))
+    REQUEST_ERRORS = Counter(
+        'smartdash_request_errors', 'Requests that ended with a 5xx status', ('route',))
+
+
+def add_trace_hook(hook):
+    """Registers hook(route, status, duration, stages), called after each request when tracing is on."""
+    _trace_hooks.append(hook)
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+@contextmanager
+def stage(name):
+    """Times a stage of the current request: `with stage('fit'): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stages = g.get('metric_stages')
+        if stages is not None:
+            stages.append((name, elapsed))
+        if prometheus_client is not None:
+            STAGE_DURATION.labels(_route(), name).observe(elapsed)
+
+
+def observe_series_lengths(lengths):
+    """Records the lengths of the series analysed by the current request."""
+    if prometheus_client is None:
+        return
+    histogram = SERIES_LENGTH.labels(_route())
+    for length in lengths:
+        histogram.observe(length)
+
+
+def observe_admission(pool, active, queued):
+    if prometheus_client is not None:
+        ADMISSION_ACTIVE.labels(pool).set(active)
+        ADMISSION_QUEUED.labels(pool).set(queued)
+
+
+def count_rejection(pool, status):
+    if prometheus_client is not None:
+        ADMISSION_REJECTED.labels(pool, str(status)).inc()
+
+
+def _before_request():
+    g.metric_start = time.perf_counter()
+    g.metric_stages = []
+    if prometheus_client is not None:
+        IN_FLIGHT.labels(_route()).inc()
+
+
+def _after_request(response):
+    start = g.get('metric_start')
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    route = _route()
+    if prometheus_client is not None:
+        REQUEST_DURATION.labels(route, request.method, str(response.status_code)).observe(duration)
+        REQUEST_SIZE.labels(route).observe(request.content_length or 0)
+        if not response.is_streamed:
+            RESPONSE_SIZE.labels(route).observe(response.calculate_content_length() or 0)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.labels(route).inc()
+    if TRACE_ENABLED:
+        stages = g.metric_stages
+        timings = [f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in stages]
+        timings.append(f'total;dur={duration * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+        for hook in _trace_hooks:
+            try:
+                hook(route, response.status_code, duration, stages)
+            except Exception as e:
+                print(f"Trace hook failed: {e}")
+    return response
+
+
+def _teardown_request(error=None):
+    # Runs even when a view raised, so the in-flight count always goes back down.
+    if g.pop('metric_start', None) is not None and prometheus_client is not None:
+        IN_FLIGHT.labels(_route()).dec()
+
+
+def metrics_response():
+    """Returns the /metrics response, merged across workers in multiprocess mode."""
+    if prometheus_client is None:
+        return jsonify({'error': 'prometheus_client is not installed'}), 503
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST), 200
+
+
+def install_metrics(app):
+    """Hooks request timing into `app`."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
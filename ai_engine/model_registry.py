@@ -0,0 +1,298 @@
+"""
+Versioned registry of fitted models, one line of versions per model key.
+
+A model key names what was fitted, e.g. "<user id>:<category>". Each key
+gets a directory under MODELS_DIR/registry:
+
+    index.json     key and the list of versions (number, data hash, size, time)
+    v<N>.joblib    the fitted model of version N
+
+fit_trend() hashes the incoming values first. If the latest version was
+fitted on the same data it is returned as is, so repeat forecasts on
+unchanged data skip fitting; otherwise the series is fitted and stored as
+a new version. Older versions beyond `max_versions` are pruned.
+fit_trends() is its batch form: every series is hashed and looked up, and
+only the ones without a matching version are fitted, together in one
+vectorized pass.
+
+fit_smoothing() does the same for exponential smoothing models, and when
+the data is the latest version's data with points appended, it continues
+that version's state over just the new points (see smoothing.py).
+
+Model files are loaded lazily with joblib in mmap mode (their arrays stay
+in the OS page cache, shared by every worker) and the most recently used
+models are kept in a per-process LRU of `max_hot` entries, keyed by the
+version and its creation time (versions restart at 1 after a delete).
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from smoothing import SmoothingFit, fit_smoothing, update_smoothing
+from trend import TrendFit, fit_trend, fit_trends, unpack_fits
+
+MAX_KEY_LENGTH = 200
+
+
+def validate_model_key(key):
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Invalid model key: {key!r}")
+
+
+def data_hash(values, kind='linear'):
+    """Identifies the data (and model kind) a model was fitted on."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(kind.encode('utf-8') + b'\n')
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def trend_model(fit):
+    """The stored form of a TrendFit."""
+    return {
+        'type': 'linear_trend',
+        'n': fit.n,
+        'coef': np.array([fit.slope]),
+        'intercept': fit.intercept,
+        'r2': fit.r2,
+    }
+
+
+def model_trend_fit(model):
+    return TrendFit(int(model['n']), float(model['coef'][0]), float(model['intercept']), float(model['r2']))
+
+
+def smoothing_kind(season_length):
+    return f'smoothing:{season_length}'
+
+
+def smoothing_model(fit):
+    """The stored form of a SmoothingFit."""
+    return {'type': 'exponential_smoothing', **fit._asdict()}
+
+
+def model_smoothing_fit(model):
+    return SmoothingFit(
+        n=int(model['n']), season_length=int(model['season_length']),
+        alpha=float(model['alpha']), beta=float(model['beta']), gamma=float(model['gamma']),
+        level=float(model['level']), trend=float(model['trend']),
+        season=np.array(model['season'], dtype=float),
+        sse=float(model['sse']), mean=float(model['mean']), m2=float(model['m2']),
+        tuned_at=int(model['tuned_at']),
+    )
+
+
+class ModelRegistry:
+    """File-backed model versions shared by all workers, with an in-process LRU."""
+
+    def __init__(self, directory, max_hot=256, max_versions=20):
+        self.directory = directory
+        self.max_hot = max_hot
+        self.max_versions = max_versions
+        self._hot = OrderedDict()
+        self._hot_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _key_dir(self, key):
+        validate_model_key(key)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    @contextmanager
+    def _locked(self, key_dir):
+        os.makedirs(key_dir, exist_ok=True)
+        with open(os.path.join(key_dir, 'lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _read_index(self, key_dir):
+        try:
+            with open(os.path.join(key_dir, 'index.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_index(self, key_dir, index):
+        tmp_path = os.path.join(key_dir, 'index.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(key_dir, 'index.json'))
+
+    def versions(self, key):
+        """Returns the version entries of `key`, oldest first (empty if unknown)."""
+        index = self._read_index(self._key_dir(key))
+        return index['versions'] if index else []
+
+    def _entry(self, key, version=None):
+        versions = self.versions(key)
+        if version is None:
+            return versions[-1] if versions else None
+        return next((v for v in versions if v['version'] == version), None)
+
+    def path(self, key, version=None):
+        """
+        Returns (version, file path) for `version` of `key`, or the latest
+        version if None. Returns (None, None) if there is no such version.
+        """
+        entry = self._entry(key, version)
+        if entry is None:
+            return None, None
+        return entry['version'], os.path.join(self._key_dir(key), f"v{entry['version']}.joblib")
+
+    def load(self, key, version=None):
+        """Returns the stored model dict, or None if there is no such version."""
+        entry = self._entry(key, version)
+        if entry is None:
+            return None
+        return self._load(key, entry)
+
+    def _load(self, key, entry):
+        # Another worker may have deleted the key and saved a new version with
+        # the same number; its creation time tells the two apart
+        hot_key = (key, entry['version'], entry['created'])
+        with self._hot_lock:
+            model = self._hot.get(hot_key)
+            if model is not None:
+                self._hot.move_to_end(hot_key)
+                return model
+
+        import joblib  # imported on first use to keep startup fast
+
+        try:
+            model = joblib.load(os.path.join(self._key_dir(key), f"v{entry['version']}.joblib"), mmap_mode='r')
+        except FileNotFoundError:  # pruned by another worker meanwhile
+            return None
+        with self._hot_lock:
+            self._hot[hot_key] = model
+            while len(self._hot) > self.max_hot:
+                self._hot.popitem(last=False)
+        return model
+
+    def save(self, key, model, fitted_on):
+        """Stores `model` as a new version of `key` and returns its version number."""
+        import joblib
+
+        key_dir = self._key_dir(key)
+        with self._locked(key_dir):
+            index = self._read_index(key_dir) or {'key': key, 'versions': []}
+            version = index['versions'][-1]['version'] + 1 if index['versions'] else 1
+            model = {**model, 'key': key, 'version': version}
+
+            tmp_path = os.path.join(key_dir, f'v{version}.joblib.tmp')
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, os.path.join(key_dir, f'v{version}.joblib'))
+
+            entry = {
+                'version': version,
+                'data_hash': fitted_on,
+                'type': model['type'],
+                'n': int(model['n']),
+                'created': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+            }
+            if model['type'] == 'linear_trend':
+                # A trend is three numbers; keeping them here lets fit_trends
+                # answer repeat batches from the index without loading models
+                entry['trend'] = [float(model['coef'][0]), float(model['intercept']), float(model['r2'])]
+            index['versions'].append(entry)
+            pruned = index['versions'][:-self.max_versions] if self.max_versions else []
+            index['versions'] = index['versions'][len(pruned):]
+            self._write_index(key_dir, index)
+
+            for old in pruned:
+                try:
+                    os.remove(os.path.join(key_dir, f"v{old['version']}.joblib"))
+                except FileNotFoundError:
+                    pass
+        with self._hot_lock:
+            self._hot[(key, version, entry['created'])] = model
+            while len(self._hot) > self.max_hot:
+                self._hot.popitem(last=False)
+        return version
+
+    def fit_trend(self, key, values):
+        """
+        Returns (TrendFit, version) for `values` under `key`, reusing the
+        latest version when it was fitted on the same data.
+        """
+        fitted_on = data_hash(values)
+        versions = self.versions(key)
+        if versions and versions[-1]['data_hash'] == fitted_on:
+            if 'trend' in versions[-1]:
+                return TrendFit(versions[-1]['n'], *versions[-1]['trend']), versions[-1]['version']
+            model = self._load(key, versions[-1])
+            if model is not None:
+                return model_trend_fit(model), versions[-1]['version']
+        fit = fit_trend(values)
+        return fit, self.save(key, trend_model(fit), fitted_on)
+
+    def fit_trends(self, keys, series):
+        """
+        Batch form of fit_trend: returns (fits, versions), a TrendFit and a
+        version for each of `series` under the matching key in `keys`.
+        Series whose latest version was fitted on the same data reuse it;
+        the rest are fitted together in one vectorized pass and saved.
+        """
+        fits = [None] * len(keys)
+        versions = [None] * len(keys)
+        hashes = [data_hash(values) for values in series]
+        for i, key in enumerate(keys):
+            entries = self.versions(key)
+            latest = entries[-1] if entries else None
+            if latest is None or latest['data_hash'] != hashes[i]:
+                continue
+            if 'trend' in latest:
+                fits[i], versions[i] = TrendFit(latest['n'], *latest['trend']), latest['version']
+                continue
+            model = self._load(key, latest)
+            if model is not None:
+                fits[i], versions[i] = model_trend_fit(model), latest['version']
+
+        misses = [i for i, fit in enumerate(fits) if fit is None]
+        for i, fit in zip(misses, unpack_fits(fit_trends([series[i] for i in misses]))):
+            fits[i], versions[i] = fit, self.save(keys[i], trend_model(fit), hashes[i])
+        return fits, versions
+
+    def fit_smoothing(self, key, values, season_length=1):
+        """
+        Returns (SmoothingFit, version) for `values` under `key`. The latest
+        version is reused for the same data, and extended over the new
+        points when `values` only appends to its data. Parameters are
+        searched again once the series has doubled since the last search.
+        """
+        kind = smoothing_kind(season_length)
+        fitted_on = data_hash(values, kind)
+        versions = self.versions(key)
+        latest = versions[-1] if versions else None
+        if latest is not None and latest['n'] <= len(values):
+            appended = latest['n'] < len(values)
+            seen_hash = data_hash(values[:latest['n']], kind) if appended else fitted_on
+            if seen_hash == latest['data_hash']:
+                model = self._load(key, latest)
+                if model is not None:
+                    fit = model_smoothing_fit(model)
+                    if not appended:
+                        return fit, latest['version']
+                    if len(values) < 2 * fit.tuned_at:
+                        fit = update_smoothing(fit, values[latest['n']:])
+                        return fit, self.save(key, smoothing_model(fit), fitted_on)
+        fit = fit_smoothing(values, season_length)
+        return fit, self.save(key, smoothing_model(fit), fitted_on)
+
+    def delete(self, key):
+        """Removes every version of `key`. Returns False if it had none."""
+        key_dir = self._key_dir(key)
+        if not os.path.isdir(key_dir):
+            return False
+        shutil.rmtree(key_dir, ignore_errors=True)
+        with self._hot_lock:
+            for hot_key in [k for k in self._hot if k[0] == key]:
+                del self._hot[hot_key]
+        return True
@@ -0,0 +1,151 @@
+"""
+Request / response formats for the AI engine.
+
+Requests may be sent as:
+  - application/json       (decoded with orjson when it is installed)
+  - application/msgpack    same structure as JSON; a 'values' field may be
+                           raw little-endian float64 bytes
+  - application/x-npy      a single NumPy array of values; other parameters
+                           (multiplier, ...) go in the query string
+  - application/x-npz      one array per category / series name
+
+Besides the original list of {'value', 'label'} dicts, a series can be sent
+columnar: {'values': [...], 'labels': [...]}. Values are loaded straight
+into float64 arrays either way.
+
+Responses are JSON unless the Accept header asks for MessagePack.
+"""
+import io
+
+import numpy as np
+from flask import Response, g, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib json module
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack bodies are rejected without it
+    msgpack = None
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+NPY_TYPE = 'application/x-npy'
+NPZ_TYPE = 'application/x-npz'
+
+
+class UnsupportedFormat(ValueError):
+    """Raised for a request body in a format the engine cannot read."""
+
+
+if orjson is not None:
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by orjson (keys sorted, like Flask's default)."""
+
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=self.option),
+                mimetype=self.mimetype,
+            )
+else:
+    OrjsonProvider = None
+
+
+def install_json_provider(app):
+    """Switches the app's JSON encoding / decoding to orjson when available."""
+    if OrjsonProvider is not None:
+        app.json_provider_class = OrjsonProvider
+        app.json = OrjsonProvider(app)
+
+
+def _query_params():
+    return {key: value for key, value in request.args.items()}
+
+
+def request_body():
+    """
+    Decodes the request body according to its Content-Type and returns a
+    dict, like request.get_json() does for JSON. The result is kept for the
+    rest of the request, so decorators and the view share one decode.
+    """
+    if 'request_body' not in g:
+        with stage('decode'):
+            g.request_body = _decode_body()
+    return g.request_body
+
+
+def _decode_body():
+    mimetype = request.mimetype
+    if mimetype in MSGPACK_TYPES:
+        if msgpack is None:
+            raise UnsupportedFormat('MessagePack support is not installed')
+        body = msgpack.unpackb(request.get_data(), raw=False)
+        if not isinstance(body, dict):
+            raise UnsupportedFormat('MessagePack body must be a map')
+        return body
+    if mimetype == NPY_TYPE:
+        values = np.load(io.BytesIO(request.get_data()), allow_pickle=False)
+        return {**_query_params(), 'values': values}
+    if mimetype == NPZ_TYPE:
+        with np.load(io.BytesIO(request.get_data()), allow_pickle=False) as archive:
+            arrays = {name: {'values': archive[name]} for name in archive.files}
+        # Each array is a named series; expose it under the keys every route reads.
+        return {**_query_params(), 'categories': arrays, 'series': arrays}
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    return body
+
+
+def as_values(values):
+    """Converts a columnar 'values' field (list, array or raw bytes) to float64."""
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        return np.frombuffer(values, dtype='<f8')
+    return np.asarray(values, dtype=float)
+
+
+def series_values(series):
+    """
+    Returns the values of one series as a float64 array. `series` is either
+    a columnar dict ({'values': ...}), a body with 'data' as a list of
+    {'value', ...} dicts, a plain list of such dicts, or a list of numbers.
+    """
+    if isinstance(series, dict):
+        if 'values' in series:
+            return as_values(series['values'])
+        series = series.get('data', [])
+    if isinstance(series, np.ndarray):
+        return series.astype(float, copy=False)
+    if len(series) and isinstance(series[0], dict):
+        return np.fromiter((point['value'] for point in series), dtype=float, count=len(series))
+    return np.asarray(series, dtype=float)
+
+
+def wants_msgpack():
+    best = request.accept_mimetypes.best_match((JSON_TYPE,) + MSGPACK_TYPES, default=JSON_TYPE)
+    return best in MSGPACK_TYPES and msgpack is not None
+
+
+def respond(result, status=200):
+    """
+    Encodes `result` as MessagePack if the client asked for it via Accept,
+    otherwise as JSON. Returns a (response, status) tuple like the routes do.
+    """
+    with stage('encode'):
+        if wants_msgpack():
+            return Response(msgpack.packb(result, use_bin_type=True), mimetype=MSGPACK_TYPES[0]), status
+        return jsonify(result), status
@@ -0,0 +1,306 @@
+"""
+PDF report rendering and background report jobs.
+
+render_report() draws the SmartDash report with ReportLab. Text wrapping
+works from cached glyph widths: the standard Type 1 fonts used here have
+no kerning, so a word's width is the sum of its characters' widths and
+each (character, font, size) only has to be measured once.
+
+ReportJobs renders reports in a process pool and stores the PDFs under a
+directory shared by every worker. A job id is the hash of the report
+payload, so identical payloads are rendered once and then served from disk.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import lru_cache
+
+from admission import Overloaded
+
+
+@lru_cache(maxsize=4096)
+def _char_width(char, font_name, font_size):
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    return stringWidth(char, font_name, font_size)
+
+
+@lru_cache(maxsize=65536)
+def text_width(text, font_name, font_size):
+    """Width of `text` in points, built from cached per-character widths."""
+    return sum(_char_width(char, font_name, font_size) for char in text)
+
+
+def wrap_text(text, font_name, font_size, max_width):
+    """
+    Greedy word wrap: returns the lines of `text` that fit in `max_width`.
+    A word wider than the line gets a line of its own.
+    """
+    space = text_width(' ', font_name, font_size)
+    lines = []
+    line = []
+    line_width = 0.0
+    for word in text.split():
+        word_width = text_width(word, font_name, font_size)
+        # Same test as before: width of (line + " " + word) must stay under max_width
+        if not line or line_width + space + word_width < max_width:
+            line_width += space + word_width
+            line.append(word)
+        else:
+            lines.append(' '.join(line))
+            line = [word]
+            line_width = word_width
+    if line or not lines:
+        lines.append(' '.join(line))
+    return lines
+
+
+def render_report(data):
+    """Renders the report for an /insights-style payload and returns the PDF bytes."""
+    # ReportLab is imported on first use to keep startup fast
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    # Title
+    p.setFont("Helvetica-Bold", 24)
+    p.drawString(50, height - 50, "SmartDash AI Report")
+
+    # Date
+    p.setFont("Helvetica", 12)
+    p.drawString(50, height - 70, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+    # Global Summary
+    y_position = height - 120
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, y_position, "Executive Summary")
+    y_position -= 25
+
+    p.setFont("Helvetica", 12)
+    summary_text = data.get('global_summary', 'No summary available.')
+    for line in wrap_text(summary_text, "Helvetica", 12, 500):
+        p.drawString(50, y_position, line)
+        y_position -= 15
+    y_position -= 25
+
+    # Insights
+    if data.get('insights'):
+        p.setFont("Helvetica-Bold", 16)
+        p.drawString(50, y_position, "Key Insights")
+        y_position -= 25
+
+        for insight in data['insights']:
+            if y_position < 50: # New page
+                p.showPage()
+                y_position = height - 50
+
+            cat = insight.get('category', 'Unknown')
+            msg = insight.get('message', '')
+            trend = insight.get('trend', '')
+
+            # Bullet point
+            p.setFont("Helvetica-Bold", 12)
+            p.drawString(50, y_position, f"• {cat} ({trend.upper()})")
+            y_position -= 15
+            p.setFont("Helvetica", 10)
+            for line in wrap_text(msg, "Helvetica", 10, 480):
+                if y_position < 40:
+                    p.showPage()
+                    p.setFont("Helvetica", 10)
+                    y_position = height - 50
+                p.drawString(70, y_position, line)
+                y_position -= 12
+            y_position -= 13
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def report_id(data):
+    """Content hash identifying a report payload."""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _render_to_file(data, path):
+    """Pool worker: renders a report and moves it into place atomically."""
+    pdf = render_report(data)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+
+
+class ReportJobs:
+    """
+    Background report rendering with results stored as files:
+        <id>.pdf      finished report
+        <id>.pending  job queued or running (created exclusively, so only
+                      one worker on the host renders a given payload)
+        <id>.error    failure message
+    A pending marker older than `timeout` seconds is treated as abandoned
+    (e.g. its worker was restarted) and the job may be submitted again; a
+    render still running by then is stopped together with its pool.
+    Each worker runs at most `max_queued` jobs at a time; beyond that,
+    submit() raises Overloaded (429).
+    """
+
+    def __init__(self, directory, pool_size=2, timeout=300, max_queued=32):
+        self.directory = directory
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._expired = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id, suffix):
+        if not job_id.isalnum():
+            raise ValueError(f"Invalid report id: {job_id!r}")
+        return os.path.join(self.directory, f'{job_id}.{suffix}')
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Not fork: forking a threaded worker copies locks other
+                # threads may hold. Forkserver children start from a clean process.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.pool_size, mp_context=multiprocessing.get_context('forkserver'))
+            return self._pool
+
+    def _discard(self, pool):
+        # A render process died or a render ran past its timeout, and the
+        # pool takes no more work; stop its processes and let the next job
+        # start a fresh one.
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def _expire(self, job_id, future, pool):
+        # The job is reported failed once its marker is stale. A process pool
+        # cannot stop a single task, so jobs sharing the pool fail with it.
+        if not future.done():
+            with self._lock:
+                self._expired.add(job_id)
+            self._discard(pool)
+
+    def _pending_is_stale(self, job_id):
+        try:
+            return os.stat(self._path(job_id, 'pending')).st_mtime + self.timeout < time.time()
+        except FileNotFoundError:
+            return False
+
+    def status(self, job_id):
+        """Returns 'done', 'pending', 'failed' or None for an unknown id."""
+        if os.path.exists(self._path(job_id, 'pdf')):
+            return 'done'
+        if os.path.exists(self._path(job_id, 'pending')):
+            return 'failed' if self._pending_is_stale(job_id) else 'pending'
+        if os.path.exists(self._path(job_id, 'error')):
+            return 'failed'
+        return None
+
+    def error(self, job_id):
+        try:
+            with open(self._path(job_id, 'error'), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return 'Report rendering timed out' if self._pending_is_stale(job_id) else None
+
+    def pdf_path(self, job_id):
+        return self._path(job_id, 'pdf')
+
+    def submit(self, data):
+        """
+        Queues a report for rendering unless an identical payload is already
+        rendered or in progress. Returns (job_id, status).
+        """
+        job_id = report_id(data)
+        status = self.status(job_id)
+        if status in ('done', 'pending'):
+            return job_id, status
+
+        with self._lock:
+            if self.in_flight >= self.max_queued:
+                raise Overloaded('Too many reports are being rendered, retry later', 429,
+                                 max(1, self.in_flight // self.pool_size))
+            self.in_flight += 1
+        try:
+            return job_id, self._start(job_id, data)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+
+    def _start(self, job_id, data):
+        pending = self._path(job_id, 'pending')
+        if self._pending_is_stale(job_id):
+            os.remove(pending)
+        try:
+            os.close(os.open(pending, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # Another worker just took this job
+            with self._lock:
+                self.in_flight -= 1
+            return 'pending'
+        try:
+            os.remove(self._path(job_id, 'error'))
+        except FileNotFoundError:
+            pass
+
+        try:
+            try:
+                pool = self._executor()
+                future = pool.submit(_render_to_file, data, self._path(job_id, 'pdf'))
+            except BrokenProcessPool:
+                self._discard(pool)
+                pool = self._executor()
+                future = pool.submit(_render_to_file, data, self._path(job_id, 'pdf'))
+        except BaseException:
+            # Nothing will finish this job, so it must not stay pending
+            os.remove(pending)
+            raise
+        timer = threading.Timer(self.timeout, self._expire, (job_id, future, pool))
+        timer.daemon = True
+        timer.start()
+        future.add_done_callback(lambda f: (timer.cancel(), self._finish(job_id, f, pool)))
+        return 'pending'
+
+    def stats(self):
+        return {'in_flight': self.in_flight, 'max_queued': self.max_queued, 'pool_size': self.pool_size}
+
+    def _finish(self, job_id, future, pool):
+        with self._lock:
+            self.in_flight -= 1
+            expired = job_id in self._expired
+            self._expired.discard(job_id)
+        # Queued jobs are cancelled when their pool is discarded
+        error = CancelledError('Report rendering was interrupted') if future.cancelled() else future.exception()
+        if expired:
+            error = TimeoutError('Report rendering timed out')
+        if isinstance(error, BrokenProcessPool):
+            self._discard(pool)
+        if error is not None:
+            with open(self._path(job_id, 'error'), 'w', encoding='utf-8') as f:
+                f.write(str(error) or error.__class__.__name__)
+        try:
+            os.remove(self._path(job_id, 'pending'))
+        except FileNotFoundError:
+            pass
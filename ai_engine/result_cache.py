@@ -0,0 +1,271 @@
+"""
+Content-addressed cache for analysis results.
+
+Responses are keyed on a hash of the route name plus the request body in
+canonical JSON form (sorted keys, no whitespace), so identical inputs hit
+the same entry no matter which backend instance or worker sent them.
+
+Storage is pluggable:
+  - memory: per-process LRU (default)
+  - file:   one file per entry in a shared directory, visible to every
+            gunicorn worker on the host
+  - redis:  any Redis-compatible server (needs the optional `redis` package)
+  - none:   disables caching
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+from payloads import JSON_TYPE, orjson, request_body, wants_msgpack
+
+
+def cache_key(route, payload):
+    """Returns the hex digest identifying `payload` sent to `route`."""
+    if orjson is not None:
+        canonical = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f'{route}\n'.encode('utf-8'))
+    digest.update(canonical)
+    return digest.hexdigest()
+
+
+def request_cache_key(route, payload):
+    """
+    Keys the current request. JSON bodies are keyed on their canonical
+    form; binary bodies (MessagePack, .npy, ...) on their raw bytes, type
+    and query string. The negotiated response format is part of the key.
+    """
+    response_format = 'msgpack' if wants_msgpack() else 'json'
+    if request.mimetype == JSON_TYPE:
+        return cache_key(f'{route}:{response_format}', payload)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f'{route}:{response_format}\n{request.mimetype}\n{request.query_string!r}\n'.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU with a TTL and a bound on the number of entries."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self):
+        return len(self._entries)
+
+
+class FileBackend:
+    """
+    One file per entry under `directory`, shared by every worker on the
+    host. A file's mtime is its write time (for the TTL) and its atime is
+    bumped on each read (for LRU order). Writes go through a temp file and
+    an atomic rename.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory, max_entries, ttl):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            written = os.stat(path).st_mtime
+            now = time.time()
+            if written + self.ttl < now:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path, (now, written))
+            return value
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _entries(self):
+        with os.scandir(self.directory) as it:
+            return [e for e in it if e.name.endswith('.json')]
+
+    def _evict(self):
+        entries = self._entries()
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        oldest = sorted(entries, key=lambda e: e.stat().st_atime)[:excess]
+        for entry in oldest:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def size(self):
+        return len(self._entries())
+
+
+class RedisBackend:
+    """
+    Redis-compatible store. Entries expire via the TTL; the size bound and
+    LRU eviction come from the server's maxmemory / allkeys-lru settings.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, ttl, prefix='smartdash:result:'):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+
+class ResultCache:
+    """Wraps a storage backend with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns a cached (mimetype, body bytes) pair, or None."""
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        mimetype, _, body = bytes(value).partition(b'\n')
+        return mimetype.decode('ascii'), body
+
+    def set(self, key, mimetype, body):
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, mimetype.encode('ascii') + b'\n' + body)
+        except Exception as e:
+            # The cache must never break a request.
+            print(f"Result cache write failed: {e}")
+
+    def stats(self):
+        size = None
+        if self.backend is not None:
+            try:
+                size = self.backend.size()
+            except Exception:
+                pass
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name if self.backend is not None else 'none',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': size,
+        }
+
+
+def create_cache(kind, max_entries=1024, ttl=300, directory=None, redis_url=None):
+    """Builds a ResultCache from configuration values."""
+    if kind == 'none':
+        return ResultCache(None)
+    if kind == 'memory':
+        return ResultCache(MemoryBackend(max_entries, ttl))
+    if kind == 'file':
+        return ResultCache(FileBackend(directory, max_entries, ttl))
+    if kind == 'redis':
+        return ResultCache(RedisBackend(redis_url, ttl))
+    raise ValueError(f"Unknown result cache backend: {kind}")
+
+
+def cached(cache, route, uncached_keys=()):
+    """
+    Decorates a Flask view so that successful (200) responses are served
+    from `cache` for identical request bodies. Bodies with any of
+    `uncached_keys` refer to server-side state that can change under the
+    same body, so they always go to the view.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if cache.backend is None:
+                return view(*args, **kwargs)
+            try:
+                payload = request_body()
+            except Exception:
+                return view(*args, **kwargs)
+            if not isinstance(payload, dict) or not payload or any(k in payload for k in uncached_keys):
+                return view(*args, **kwargs)
+
+            key = request_cache_key(route, payload)
+            hit = cache.get(key)
+            if hit is not None:
+                mimetype, body = hit
+                response = Response(body, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response, 200
+
+            response, status = view(*args, **kwargs)
+            if status == 200:
+                cache.set(key, response.mimetype, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response, status
+        return wrapper
+    return decorator
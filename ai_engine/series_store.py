@@ -0,0 +1,166 @@
+"""
+Incremental per-series state for long-running series.
+
+Instead of resending and refitting a full history, callers append new
+points to a series id and the engine keeps just enough state to answer
+/predict and /insights: the point count, running co-moments of (index,
+value), the running mean / max / min, and the last two values.
+
+The co-moments are the centered form of the usual sums (Σx, Σy, Σxy, Σx²,
+Σy²) and are updated Welford-style, so each append is O(1) and stays
+numerically stable for long series with large values. States are small
+JSON files under MODELS_DIR/series, locked per file so every gunicorn
+worker on the host sees the same series.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from trend import TrendFit, TrendFits, SeriesStats, r_squared
+
+SERIES_ID_RE = re.compile(r'^[\w.:@-]{1,200}$')
+
+
+def validate_series_id(series_id):
+    if not isinstance(series_id, str) or not SERIES_ID_RE.match(series_id):
+        raise ValueError(f"Invalid series id: {series_id!r}")
+
+
+def new_state(series_id):
+    return {
+        'id': series_id,
+        'n': 0,
+        'mean_x': 0.0,
+        'mean_y': 0.0,
+        'm2_x': 0.0,   # Σ(x - mean_x)²
+        'm2_y': 0.0,   # Σ(y - mean_y)²
+        'c_xy': 0.0,   # Σ(x - mean_x)(y - mean_y)
+        'max': None,
+        'min': None,
+        'last': [],    # last two values, oldest first
+    }
+
+
+def append_value(state, value):
+    """Adds one point (at index n) to `state` in O(1)."""
+    y = float(value)
+    x = float(state['n'])
+    n = state['n'] + 1
+
+    dx = x - state['mean_x']
+    dy = y - state['mean_y']
+    mean_x = state['mean_x'] + dx / n
+    mean_y = state['mean_y'] + dy / n
+
+    state['n'] = n
+    state['mean_x'] = mean_x
+    state['mean_y'] = mean_y
+    state['m2_x'] += dx * (x - mean_x)
+    state['m2_y'] += dy * (y - mean_y)
+    state['c_xy'] += dx * (y - mean_y)
+    state['max'] = y if state['max'] is None else max(state['max'], y)
+    state['min'] = y if state['min'] is None else min(state['min'], y)
+    state['last'] = (state['last'] + [y])[-2:]
+    return state
+
+
+def state_ss_res(state):
+    """Residual sum of squares of a state's trend (at least 2 points)."""
+    slope = state['c_xy'] / state['m2_x']
+    return max(state['m2_y'] - slope * state['c_xy'], 0.0)
+
+
+def state_fit(state):
+    """Returns the TrendFit for a state with at least 2 points."""
+    if state['n'] < 2:
+        raise ValueError('Need at least 2 data points to fit a trend')
+    slope = state['c_xy'] / state['m2_x']
+    intercept = state['mean_y'] - slope * state['mean_x']
+    return TrendFit(state['n'], slope, intercept, r_squared(state_ss_res(state), state['m2_y']))
+
+
+def states_to_arrays(states):
+    """
+    Converts states (each with at least 2 points) into the TrendFits and
+    SeriesStats arrays the vectorized routes work on.
+    """
+    fits = [state_fit(s) for s in states]
+    fit_arrays = TrendFits(
+        n=np.array([f.n for f in fits], dtype=np.int64),
+        slope=np.array([f.slope for f in fits], dtype=float),
+        intercept=np.array([f.intercept for f in fits], dtype=float),
+        r2=np.array([f.r2 for f in fits], dtype=float),
+    )
+    stats = SeriesStats(
+        mean=np.array([s['mean_y'] for s in states], dtype=float),
+        max=np.array([s['max'] for s in states], dtype=float),
+        min=np.array([s['min'] for s in states], dtype=float),
+        last=np.array([s['last'][-1] for s in states], dtype=float),
+        previous=np.array([s['last'][-2] for s in states], dtype=float),
+    )
+    return fit_arrays, stats
+
+
+class SeriesStore:
+    """File-backed map of series id -> state, safe across worker processes."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, series_id):
+        validate_series_id(series_id)
+        digest = hashlib.blake2b(series_id.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def get(self, series_id):
+        """Returns the state for `series_id`, or None if it does not exist."""
+        try:
+            with open(self._path(series_id), 'r', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        # An empty file is a series being created by a concurrent append.
+        return json.loads(raw) if raw else None
+
+    def append(self, series_id, values):
+        """Appends `values` to the series (creating it) and returns the state."""
+        path = self._path(series_id)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            raw = f.read()
+            state = json.loads(raw) if raw else new_state(series_id)
+            for value in values:
+                append_value(state, value)
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+        return state
+
+    def replace(self, series_id, values):
+        """Rebuilds a series' state from scratch out of `values`."""
+        path = self._path(series_id)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            state = new_state(series_id)
+            for value in values:
+                append_value(state, value)
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+        return state
+
+    def delete(self, series_id):
+        """Removes a series. Returns False if it did not exist."""
+        try:
+            os.remove(self._path(series_id))
+            return True
+        except FileNotFoundError:
+            return False
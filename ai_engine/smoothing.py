@@ -0,0 +1,262 @@
+"""
+Holt / Holt-Winters exponential smoothing, the alternative to the linear
+trend in trend.py.
+
+The model is the additive one in error-correction form. With the one-step
+error e_t = y_t - (level + trend + season[t - m]):
+
+    level  += trend + alpha * e_t
+    trend  += alpha * beta * e_t
+    season[t] = season[t - m] + gamma * e_t
+
+Holt is the same recurrence with a season length of 1 and gamma = 0.
+
+The recurrence is sequential, but it is linear in the data: the errors
+follow the ARIMA filter (1 - B)(1 - B^m) y_t = theta(B) e_t, so after the
+first season they come out of one scipy.signal.lfilter call (a C loop)
+and the final level, trend and season are weighted sums of the errors.
+A fit is O(n), with no Python work per point.
+
+alpha, beta and gamma are chosen from a small grid by the sum of squared
+one-step errors over the last SEARCH_WINDOW points. A SmoothingFit is the
+whole state of the model, so new points are folded in with
+update_smoothing() without running over the history again.
+"""
+from itertools import product
+from typing import NamedTuple
+
+import numpy as np
+
+from trend import r_squared
+
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.01, 0.05, 0.1, 0.2)
+GAMMAS = (0.05, 0.1, 0.2, 0.4)
+SEARCH_WINDOW = 4096
+MAX_SEASON_LENGTH = 366
+# Below this many points the plain recurrence beats setting up lfilter
+SHORT_SERIES = 64
+
+
+class SmoothingFit(NamedTuple):
+    n: int
+    season_length: int   # 1 = Holt (no seasonality)
+    alpha: float
+    beta: float
+    gamma: float
+    level: float
+    trend: float
+    season: np.ndarray   # seasonal terms of the next season_length points
+    sse: float           # sum of squared one-step errors
+    mean: float          # mean and sum of squared deviations of the
+    m2: float            # values seen so far, for the accuracy score
+    tuned_at: int        # n when alpha / beta / gamma were last searched
+
+    @property
+    def r2(self):
+        """One-step-ahead R² over every point seen so far."""
+        return r_squared(self.sse, self.m2)
+
+
+def initial_state(y, m):
+    """
+    Level, trend and season before the first point, from the first two
+    seasons: the trend is the change between their means and the season is
+    the first one with that line taken out. For m = 1 this starts the
+    trend at y[1] - y[0] with no error on the first point.
+    """
+    first = y[:m].mean()
+    trend = (y[m:2 * m].mean() - first) / m
+    level = first - trend * (m + 1) / 2
+    season = y[:m] - (level + trend * np.arange(1, m + 1))
+    return float(level), float(trend), season
+
+
+def _recurse(y, alpha, beta, gamma, level, trend, season):
+    """The recurrence one point at a time. Returns (errors, final state)."""
+    m = len(season)
+    season = np.array(season, dtype=float).tolist()
+    step = alpha * beta
+    errors = np.empty(len(y))
+    for t, value in enumerate(y.tolist()):
+        i = t % m
+        error = value - (level + trend + season[i])
+        level += trend + alpha * error
+        trend += step * error
+        season[i] += gamma * error
+        errors[t] = error
+    return errors, (level, trend, np.roll(season, -(len(y) % m)))
+
+
+def _filter_coefficients(alpha, beta, gamma, m):
+    """
+    (phi, theta) with phi(B) y_t = theta(B) e_t. theta is read off the
+    response of y to a single unit error, differenced by phi.
+    """
+    phi = np.convolve([1.0, -1.0], np.r_[1.0, np.zeros(m - 1), -1.0])
+    # y_t = forecast_t + e_t from a zero state, for e = (1, 0, 0, ...)
+    level = trend = 0.0
+    season = [0.0] * m
+    response = np.empty(m + 2)
+    for t in range(m + 2):
+        error = 1.0 if t == 0 else 0.0
+        i = t % m
+        response[t] = level + trend + season[i] + error
+        level += trend + alpha * error
+        trend += alpha * beta * error
+        season[i] += gamma * error
+    return phi, np.convolve(phi, response)[:m + 2]
+
+
+def _final_state(errors, alpha, beta, gamma, level, trend, season):
+    """Level, trend and (rotated) season after the points behind `errors`."""
+    n = len(errors)
+    m = len(season)
+    total = float(errors.sum())
+    # level_n = level + n * trend + alpha * beta * sum_t (n - 1 - t) e_t + alpha * sum_t e_t
+    weighted = float(errors @ np.arange(n - 1, -1, -1, dtype=float))
+    final_level = level + n * trend + alpha * beta * weighted + alpha * total
+    final_trend = trend + alpha * beta * total
+    if m == 1:
+        return final_level, final_trend, season + gamma * total
+    phase_sums = np.bincount(np.arange(n) % m, weights=errors, minlength=m)
+    return final_level, final_trend, np.roll(season + gamma * phase_sums, -(n % m))
+
+
+def _run(y, alpha, beta, gamma, level, trend, season):
+    """
+    One-step errors over `y` from the given state, and the state after it.
+    The first season runs through the plain recurrence, which also gives
+    the filter its initial conditions; lfilter does the rest.
+    """
+    m = len(season)
+    head = m + 1
+    if len(y) <= max(head, SHORT_SERIES):
+        return _recurse(y, alpha, beta, gamma, level, trend, season)
+
+    from scipy.signal import lfilter, lfiltic  # imported on first use to keep startup fast
+
+    errors = np.empty(len(y))
+    errors[:head], _ = _recurse(y[:head], alpha, beta, gamma, level, trend, season)
+    phi, theta = _filter_coefficients(alpha, beta, gamma, m)
+    zi = lfiltic(phi, theta, errors[head - 1::-1], y[head - 1::-1])
+    errors[head:], _ = lfilter(phi, theta, y[head:], zi=zi)
+    return errors, _final_state(errors, alpha, beta, gamma, level, trend, np.asarray(season, dtype=float))
+
+
+def parameter_grid(season_length):
+    """
+    The (alpha, beta, gamma) candidates searched by fit_smoothing, within
+    the usual bounds gamma < 1 - alpha.
+    """
+    if season_length == 1:
+        return list(product(ALPHAS, BETAS, (0.0,)))
+    return [(a, b, g) for a, b, g in product(ALPHAS, BETAS, GAMMAS) if g < 1 - a]
+
+
+def _invertible(params, season_length):
+    # Errors stay bounded only if every root of theta lies inside the unit circle
+    _, theta = _filter_coefficients(*params, season_length)
+    return np.abs(np.roots(theta)).max() < 1
+
+
+def search_parameters(y, season_length):
+    """
+    Returns the (alpha, beta, gamma) with the smallest sum of squared
+    one-step errors over `y`. Every candidate is one O(len(y)) filter pass;
+    the best one that keeps the filter stable is kept.
+    """
+    start = initial_state(y, season_length)
+    scores = []
+    for params in parameter_grid(season_length):
+        errors, _ = _run(y, *params, *start)
+        sse = float(errors @ errors)
+        if np.isfinite(sse):
+            scores.append((sse, params))
+    for _, params in sorted(scores):
+        if _invertible(params, season_length):
+            return params
+    raise ValueError('Exponential smoothing did not converge for this series')
+
+
+def validate_season_length(season_length):
+    if not 1 <= season_length <= MAX_SEASON_LENGTH:
+        raise ValueError(f'season_length must be between 1 and {MAX_SEASON_LENGTH}')
+
+
+def fit_smoothing(values, season_length=1):
+    """
+    Fits Holt (season_length 1) or additive Holt-Winters to `values`, which
+    needs at least two full seasons (and at least 2 points).
+    """
+    y = np.asarray(values, dtype=float)
+    m = int(season_length)
+    validate_season_length(m)
+    n = y.shape[0]
+    if n < max(2, 2 * m):
+        if m == 1:
+            raise ValueError('Need at least 2 data points to fit a trend')
+        raise ValueError(f'Holt-Winters needs at least 2 full seasons ({2 * m} data points)')
+
+    window = y[-max(SEARCH_WINDOW, 2 * m):]
+    alpha, beta, gamma = search_parameters(window, m)
+    errors, (level, trend, season) = _run(y, alpha, beta, gamma, *initial_state(y, m))
+
+    mean = float(y.mean())
+    deviations = y - mean
+    return SmoothingFit(
+        n=n, season_length=m, alpha=alpha, beta=beta, gamma=gamma,
+        level=float(level), trend=float(trend), season=np.asarray(season, dtype=float),
+        sse=float(errors @ errors), mean=mean, m2=float(deviations @ deviations), tuned_at=n,
+    )
+
+
+def update_smoothing(fit, values):
+    """
+    Returns `fit` with `values` appended to its series, in O(len(values)):
+    the recurrence continues from the stored state with the same parameters.
+    """
+    y = np.asarray(values, dtype=float)
+    if y.shape[0] == 0:
+        return fit
+    errors, (level, trend, season) = _run(
+        y, fit.alpha, fit.beta, fit.gamma, fit.level, fit.trend, np.array(fit.season, dtype=float)
+    )
+
+    # Merge the running mean / squared deviations with those of the new points
+    count = y.shape[0]
+    n = fit.n + count
+    batch_mean = float(y.mean())
+    deviations = y - batch_mean
+    delta = batch_mean - fit.mean
+    return fit._replace(
+        n=n, level=float(level), trend=float(trend), season=np.asarray(season, dtype=float),
+        sse=fit.sse + float(errors @ errors),
+        mean=fit.mean + delta * count / n,
+        m2=fit.m2 + float(deviations @ deviations) + delta * delta * fit.n * count / n,
+    )
+
+
+def smoothing_forecast(fit, steps):
+    """Forecasts `steps` periods ahead (1 = the next period)."""
+    steps = np.asarray(steps, dtype=np.int64)
+    return fit.level + fit.trend * steps + np.asarray(fit.season)[(steps - 1) % fit.season_length]
+
+
+def simulate_smoothing(fit, steps, draws, seed=0):
+    """
+    Returns a (draws, len(steps)) matrix of simulated values `steps`
+    periods ahead, for confidence bands. An error j periods before the
+    forecast moves it by c_j = alpha * (1 + j * beta) (+ gamma when j is a
+    whole number of seasons), so the h-step error variance is
+    sigma² * (1 + sum of c_j² for j < h), sigma² being the one-step
+    error variance.
+    """
+    steps = np.asarray(steps, dtype=np.int64)
+    sigma = np.sqrt(fit.sse / max(fit.n - 1, 1))
+    j = np.arange(1, steps.max())
+    c = fit.alpha * (1 + j * fit.beta) + fit.gamma * (j % fit.season_length == 0)
+    spread = np.concatenate(([1.0], 1.0 + np.cumsum(c * c)))
+    scale = sigma * np.sqrt(spread[steps - 1])
+    rng = np.random.default_rng(seed)
+    return smoothing_forecast(fit, steps) + rng.normal(0.0, 1.0, (draws, steps.shape[0])) * scale
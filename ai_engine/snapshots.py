@@ -0,0 +1,152 @@
+"""
+Versioned dashboard snapshots, one line of versions per tenant.
+
+A snapshot is everything the dashboard shows for a tenant's categories
+(insights, forecasts, correlations), computed in one pass and stored so
+that dashboard reads are file lookups. Each tenant gets a directory under
+MODELS_DIR/snapshots:
+
+    index.json          tenant and the list of versions (number, time, changed categories)
+    v<N>.json           the snapshot document of version N
+    state.json          per category of the latest version: data hash and
+                        the trend / summary numbers it was built from
+    values/<hash>.npy   the values of each category in the latest version
+
+The state lets the next refresh reuse every category whose data hash is
+unchanged, and the stored values let a refresh send only the categories
+that changed. Older versions beyond `max_versions` are pruned.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from model_registry import data_hash
+
+MAX_TENANT_LENGTH = 200
+
+
+def validate_tenant(tenant):
+    if not isinstance(tenant, str) or not tenant or len(tenant) > MAX_TENANT_LENGTH:
+        raise ValueError(f"Invalid tenant id: {tenant!r}")
+
+
+def category_hash(values):
+    return data_hash(values, 'category')
+
+
+class SnapshotStore:
+    """File-backed snapshot versions shared by all workers."""
+
+    def __init__(self, directory, max_versions=10):
+        self.directory = directory
+        self.max_versions = max_versions
+        os.makedirs(directory, exist_ok=True)
+
+    def _tenant_dir(self, tenant):
+        validate_tenant(tenant)
+        digest = hashlib.blake2b(tenant.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    @contextmanager
+    def locked(self, tenant):
+        """Holds the tenant's lock, so one refresh at a time builds on the latest version."""
+        tenant_dir = self._tenant_dir(tenant)
+        os.makedirs(os.path.join(tenant_dir, 'values'), exist_ok=True)
+        with open(os.path.join(tenant_dir, 'lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_json(self, path, document):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+        os.replace(tmp_path, path)
+
+    def versions(self, tenant):
+        """Returns the version entries of `tenant`, oldest first (empty if unknown)."""
+        index = self._read_json(os.path.join(self._tenant_dir(tenant), 'index.json'))
+        return index['versions'] if index else []
+
+    def path(self, tenant, version=None):
+        """
+        Returns the snapshot file of `version` (default: latest), or None if
+        there is no such version.
+        """
+        versions = self.versions(tenant)
+        if version is None:
+            version = versions[-1]['version'] if versions else None
+        if version is None or not any(v['version'] == version for v in versions):
+            return None
+        return os.path.join(self._tenant_dir(tenant), f'v{version}.json')
+
+    def state(self, tenant):
+        """Per-category state of the latest version ({} if there is none)."""
+        return self._read_json(os.path.join(self._tenant_dir(tenant), 'state.json')) or {}
+
+    def values(self, tenant, digest):
+        """The stored values with data hash `digest`, memory-mapped; None if missing."""
+        try:
+            return np.load(os.path.join(self._tenant_dir(tenant), 'values', f'{digest}.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+
+    def save(self, tenant, snapshot, state, values, changed):
+        """
+        Stores `snapshot` as a new version of `tenant`, with the per-category
+        `state` and `values` ({data hash: array}) it was built from. Must be
+        called under locked(tenant). Returns the version number.
+        """
+        tenant_dir = self._tenant_dir(tenant)
+        index = self._read_json(os.path.join(tenant_dir, 'index.json')) or {'tenant': tenant, 'versions': []}
+        version = index['versions'][-1]['version'] + 1 if index['versions'] else 1
+        created = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        snapshot = {**snapshot, 'tenant': tenant, 'version': version, 'created': created}
+
+        values_dir = os.path.join(tenant_dir, 'values')
+        for digest, array in values.items():
+            path = os.path.join(values_dir, f'{digest}.npy')
+            if not os.path.exists(path):
+                with open(path + '.tmp', 'wb') as f:
+                    np.save(f, np.asarray(array, dtype=np.float64))
+                os.replace(path + '.tmp', path)
+
+        self._write_json(os.path.join(tenant_dir, f'v{version}.json'), snapshot)
+        self._write_json(os.path.join(tenant_dir, 'state.json'), state)
+
+        index['versions'].append({'version': version, 'created': created, 'changed': changed})
+        pruned = index['versions'][:-self.max_versions] if self.max_versions else []
+        index['versions'] = index['versions'][len(pruned):]
+        self._write_json(os.path.join(tenant_dir, 'index.json'), index)
+
+        for entry in pruned:
+            try:
+                os.remove(os.path.join(tenant_dir, f"v{entry['version']}.json"))
+            except FileNotFoundError:
+                pass
+        # Only the latest version's values are needed for the next refresh
+        live = {f"{entry['data_hash']}.npy" for entry in state.values()}
+        for name in os.listdir(values_dir):
+            if name.endswith('.npy') and name not in live:
+                os.remove(os.path.join(values_dir, name))
+        return version
+
+    def delete(self, tenant):
+        """Removes every version of `tenant`. Returns False if it had none."""
+        tenant_dir = self._tenant_dir(tenant)
+        if not os.path.isdir(tenant_dir):
+            return False
+        shutil.rmtree(tenant_dir, ignore_errors=True)
+        return True
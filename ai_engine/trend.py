@@ -0,0 +1,206 @@
+"""
+Closed-form trend fitting shared by the prediction routes.
+
+Every route fits the same model: an ordinary least-squares line over the
+point index (x = 0, 1, ..., n - 1). For that design the normal equations
+collapse to a handful of sums, so we solve them directly with NumPy instead
+of building a sklearn LinearRegression per request. Results match
+LinearRegression.fit / predict / score for this 1-D case.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+
+class TrendFit(NamedTuple):
+    n: int
+    slope: float
+    intercept: float
+    r2: float
+
+
+def r_squared(ss_res, ss_tot):
+    # Same conventions as sklearn's r2_score for a constant target:
+    # a perfect fit scores 1.0, anything else 0.0.
+    if ss_tot == 0:
+        return 1.0 if ss_res == 0 else 0.0
+    return 1.0 - ss_res / ss_tot
+
+
+def fit_trend(values):
+    """
+    Fits y = intercept + slope * x over x = 0..n-1.
+    `values` may be any sequence of numbers; at least 2 are required.
+    """
+    y = np.asarray(values, dtype=float)
+    n = y.shape[0]
+    if n < 2:
+        raise ValueError('Need at least 2 data points to fit a trend')
+
+    x_mean = (n - 1) / 2.0
+    # sum((x - x_mean)^2) for x = 0..n-1
+    sxx = n * (n * n - 1) / 12.0
+
+    y_mean = y.mean()
+    y_centered = y - y_mean
+    x_centered = np.arange(n, dtype=float) - x_mean
+
+    slope = float(x_centered @ y_centered) / sxx
+    intercept = float(y_mean - slope * x_mean)
+
+    residuals = y_centered - slope * x_centered
+    r2 = r_squared(float(residuals @ residuals), float(y_centered @ y_centered))
+
+    return TrendFit(n, slope, intercept, r2)
+
+
+def forecast(fit, horizon):
+    """Returns the fitted line evaluated at the next `horizon` indices."""
+    future_x = np.arange(fit.n, fit.n + horizon, dtype=float)
+    return fit.intercept + fit.slope * future_x
+
+
+def trend_residuals(values, fit):
+    """Returns values minus the fitted line."""
+    y = np.asarray(values, dtype=float)
+    return y - (fit.intercept + fit.slope * np.arange(y.shape[0], dtype=float))
+
+
+def simulate_forecasts(fit, steps, draws, residuals=None, ss_res=None, seed=0):
+    """
+    Returns a (draws, len(steps)) matrix of simulated values of the series
+    `steps` periods ahead (1 = the next period), for confidence bands.
+
+    Each draw perturbs the fitted line by the sampling error of its level
+    and slope, which for OLS on x = 0..n-1 are independent with variances
+    sigma²/n and sigma²/Sxx, and adds one period's noise. The noise is
+    resampled from `residuals` (bootstrap) when given, otherwise drawn
+    from a normal with the residual variance (from `ss_res`).
+    """
+    n = fit.n
+    dof = max(n - 2, 1)
+    if residuals is not None:
+        ss_res = float(residuals @ residuals)
+    sigma = np.sqrt(ss_res / dof)
+    x_mean = (n - 1) / 2.0
+    sxx = n * (n * n - 1) / 12.0
+    x = n - 1 + np.asarray(steps, dtype=float)
+
+    rng = np.random.default_rng(seed)
+    level = rng.normal(0.0, sigma / np.sqrt(n), (draws, 1))
+    slope = rng.normal(0.0, sigma / np.sqrt(sxx), (draws, 1))
+    if residuals is not None:
+        # Residuals shrink by (n - 2) / n on average; scale them back up.
+        noise = rng.choice(residuals, size=(draws, x.shape[0])) * np.sqrt(n / dof)
+    else:
+        noise = rng.normal(0.0, sigma, (draws, x.shape[0]))
+    return fit.intercept + fit.slope * x + level + slope * (x - x_mean) + noise
+
+
+class PackedSeries(NamedTuple):
+    values: np.ndarray   # every series concatenated end to end
+    lengths: np.ndarray  # points per series
+    starts: np.ndarray   # offset of each series in `values`
+
+
+def pack_series(series):
+    """
+    Concatenates a list of 1-D value sequences into one flat float array
+    so per-series statistics can be computed as segment reductions.
+    """
+    if isinstance(series, PackedSeries):
+        return series
+    lengths = np.fromiter((len(s) for s in series), dtype=np.int64, count=len(series))
+    if lengths.size == 0:
+        return PackedSeries(np.empty(0), lengths, lengths.copy())
+    values = np.concatenate([np.asarray(s, dtype=float) for s in series])
+    return PackedSeries(values, lengths, np.cumsum(lengths) - lengths)
+
+
+class TrendFits(NamedTuple):
+    n: np.ndarray
+    slope: np.ndarray
+    intercept: np.ndarray
+    r2: np.ndarray
+
+
+def fit_trends(series):
+    """
+    Fits every series in `series` (a list of 1-D value sequences, each with
+    at least 2 points, or a PackedSeries) in one vectorized pass.
+
+    Ragged lengths are handled with segment sums: the series are concatenated
+    into one flat array and each statistic is reduced per segment with
+    np.add.reduceat, so there is no per-series Python work beyond the concat.
+    """
+    y, lengths, starts = pack_series(series)
+    if lengths.size == 0:
+        empty = np.empty(0)
+        return TrendFits(lengths, empty, empty, empty)
+    if lengths.min() < 2:
+        raise ValueError('Need at least 2 data points to fit a trend')
+
+    n = lengths.astype(float)
+
+    x_mean = (n - 1) / 2.0
+    sxx = n * (n * n - 1) / 12.0
+    y_mean = np.add.reduceat(y, starts) / n
+
+    local_x = np.arange(y.shape[0], dtype=float) - np.repeat(starts, lengths)
+    x_centered = local_x - np.repeat(x_mean, lengths)
+    y_centered = y - np.repeat(y_mean, lengths)
+
+    slope = np.add.reduceat(x_centered * y_centered, starts) / sxx
+    intercept = y_mean - slope * x_mean
+
+    residuals = y_centered - np.repeat(slope, lengths) * x_centered
+    ss_res = np.add.reduceat(residuals * residuals, starts)
+    ss_tot = np.add.reduceat(y_centered * y_centered, starts)
+
+    # Same constant-target convention as r_squared, applied per series.
+    constant = ss_tot == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = 1.0 - ss_res / ss_tot
+    r2[constant] = ss_res[constant] == 0
+
+    return TrendFits(lengths, slope, intercept, r2)
+
+
+def unpack_fits(fits):
+    """Yields a scalar TrendFit for each series in a TrendFits batch."""
+    for row in zip(fits.n.tolist(), fits.slope.tolist(), fits.intercept.tolist(), fits.r2.tolist()):
+        yield TrendFit(*row)
+
+
+def forecast_many(fits, horizon):
+    """Returns a (len(fits.n), horizon) matrix of forecasts for `fits`."""
+    future_x = fits.n[:, None] + np.arange(horizon)
+    return fits.intercept[:, None] + fits.slope[:, None] * future_x
+
+
+class SeriesStats(NamedTuple):
+    mean: np.ndarray
+    max: np.ndarray
+    min: np.ndarray
+    last: np.ndarray
+    previous: np.ndarray
+
+
+def series_stats(series):
+    """
+    Per-series mean, max, min and the last two values for a list of series
+    (or a PackedSeries), each with at least 2 points.
+    """
+    y, lengths, starts = pack_series(series)
+    if lengths.size == 0:
+        empty = np.empty(0)
+        return SeriesStats(empty, empty, empty, empty, empty)
+
+    ends = starts + lengths
+    return SeriesStats(
+        mean=np.add.reduceat(y, starts) / lengths,
+        max=np.maximum.reduceat(y, starts),
+        min=np.minimum.reduceat(y, starts),
+        last=y[ends - 1],
+        previous=y[ends - 2],
+    )
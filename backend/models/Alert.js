@@ -11,9 +11,9 @@ const AlertSchema = new mongoose.Schema({
         required: true
     },
     condition: {
-        type: String, // 'gt' or 'lt'
+        type: String, // 'gt', 'lt', or 'anomaly' (threshold is then a z-score, see the AI engine's /anomalies)
         required: true,
-        enum: ['gt', 'lt']
+        enum: ['gt', 'lt', 'anomaly']
     },
     threshold: {
         type: Number,
@@ -11,32 +11,28 @@ const FormData = require('form-data');
 // Configure upload (memory storage for proxying)
 const upload = multer({ storage: multer.memoryStorage() });
 
-// Rate limiting / concurrency queue state
+// Concurrency cap for AI engine calls. The engine does its own admission
+// control and answers 429/503 with Retry-After when it is busy.
+const MAX_AI_CONCURRENCY = parseInt(process.env.AI_ENGINE_CONCURRENCY, 10) || 8;
 const requestQueue = [];
-let isProcessingQueue = false;
+let activeAICalls = 0;
 
 // Simple in-memory cache
 const aiCache = new Map();
 const CACHE_TTL_MS = 300000; // 5 minutes
 
-// Process the queue sequentially
-const processQueue = async () => {
-    if (isProcessingQueue) return;
-    isProcessingQueue = true;
-
-    while (requestQueue.length > 0) {
+// Start queued calls while fewer than MAX_AI_CONCURRENCY are running
+const processQueue = () => {
+    while (activeAICalls < MAX_AI_CONCURRENCY && requestQueue.length > 0) {
         const { path, payload, retries, resolve, reject } = requestQueue.shift();
-        try {
-            const result = await executeAIEngineCall(path, payload, retries);
-            resolve(result);
-        } catch (err) {
-            reject(err);
-        }
-        // Small delay between requests to be safe from rate limits
-        await new Promise(res => setTimeout(res, 1500));
+        activeAICalls++;
+        executeAIEngineCall(path, payload, retries)
+            .then(resolve, reject)
+            .finally(() => {
+                activeAICalls--;
+                processQueue();
+            });
     }
-
-    isProcessingQueue = false;
 };
 
 // Core logic to call the AI Engine
@@ -65,12 +61,14 @@ const executeAIEngineCall = async (path, payload, retries = 3) => {
                 if (aiRes.statusCode === 200) {
                     resolve(JSON.parse(body));
                 } else {
+                    let message = `AI Engine error: ${aiRes.statusCode}`;
                     try {
-                        const errBody = JSON.parse(body);
-                        reject(new Error(errBody.error || `AI Engine error: ${aiRes.statusCode}`));
-                    } catch {
-                        reject(new Error(`AI Engine error: ${aiRes.statusCode}`));
-                    }
+                        message = JSON.parse(body).error || message;
+                    } catch { }
+                    const err = new Error(message);
+                    err.status = aiRes.statusCode;
+                    err.retryAfter = parseInt(aiRes.headers['retry-after'], 10);
+                    reject(err);
                 }
             });
         });
@@ -91,8 +89,11 @@ const executeAIEngineCall = async (path, payload, retries = 3) => {
         } catch (err) {
             console.log(`⚠️ AI Attempt ${i + 1} failed: ${err.message}`);
             if (i === retries) throw err;
-            // Wait longer if hitting 429 (incremental backoff)
-            const delay = err.message.includes('429') ? 4000 + i * 2000 : 2000;
+            // Engine overloaded: wait as long as it asks (Retry-After), else back off
+            const overloaded = err.status === 429 || err.status === 503;
+            const delay = overloaded
+                ? (err.retryAfter > 0 ? err.retryAfter * 1000 : 4000 + i * 2000)
+                : 2000;
             await new Promise(res => setTimeout(res, delay));
         }
     }
@@ -172,6 +173,18 @@ router.post('/add', protect, async (req, res) => {
                         relatedAlert: alert._id
                     });
                 }
+
+                if (alert.condition === 'anomaly') {
+                    const latest = await latestAnomaly(req.user._id, req.body.category, alert.threshold);
+                    if (latest && latest.anomaly) {
+                        await Notification.create({
+                            user: req.user._id,
+                            // z is null when the value breaks out of a perfectly flat run
+                            message: `🚨 Anomaly: ${req.body.category} is ${latest.z === null ? 'suddenly' : `${Math.abs(latest.z)}σ`} ${latest.value > latest.rolling_mean ? 'above' : 'below'} its recent average of ${latest.rolling_mean} (Value: ${req.body.value})`,
+                            relatedAlert: alert._id
+                        });
+                    }
+                }
             }
         } catch (alertErr) {
             console.error('Alert check failed:', alertErr.message);
@@ -280,6 +293,42 @@ router.post('/predict/upload', protect, upload.single('file'), async (req, res)
     }
 });
 
+// Entries of recent history an anomaly alert looks at, and the rolling window it uses
+const ANOMALY_HISTORY = 500;
+const ANOMALY_WINDOW = 20;
+
+// Rolling statistics of the newest entry of one category, from the engine's /anomalies
+const latestAnomaly = async (userId, category, threshold) => {
+    const recent = await Data.find({ user: userId, category }).sort({ date: -1 }).limit(ANOMALY_HISTORY);
+    if (recent.length <= ANOMALY_WINDOW) return null;
+    const payload = JSON.stringify({
+        categories: { [category]: { values: recent.reverse().map(d => d.value) } },
+        window: ANOMALY_WINDOW,
+        threshold,
+        max_anomalies: 0
+    });
+    const aiResponse = await callAIEngine('/anomalies', payload);
+    return aiResponse.results[category].latest;
+};
+
+// Optional forecast engine: ?model=holt or ?model=holt_winters&season_length=12 (default: linear)
+const forecastModel = (query) => {
+    const options = {};
+    if (query.model) options.model = String(query.model);
+    if (query.season_length) options.season_length = parseInt(query.season_length, 10);
+    return options;
+};
+
+// Optional ?points=N: the engine returns a shape-preserving N-point history instead of every entry
+const historyOptions = (query) => {
+    const points = parseInt(query.points, 10);
+    return Number.isFinite(points) ? { downsample: points } : {};
+};
+
+const chartHistory = (aiResponse, userData, fields) => aiResponse.history
+    ? aiResponse.history.map(p => fields(userData[p.index]))
+    : userData.map(fields);
+
 router.get('/predict', protect, async (req, res) => {
     try {
         // Build filter — optionally filter by category
@@ -297,15 +346,19 @@ router.get('/predict', protect, async (req, res) => {
         }
 
         // Send data to Flask AI engine
+        // model_key keeps a versioned model per user/category in the engine's registry
         const payload = JSON.stringify({
-            data: userData.map(d => ({ value: d.value, label: d.label }))
+            data: userData.map(d => ({ value: d.value, label: d.label })),
+            model_key: `${req.user._id}:${req.query.category || 'All'}`,
+            ...forecastModel(req.query),
+            ...historyOptions(req.query)
         });
 
         const aiResponse = await callAIEngine('/predict', payload);
 
         res.json({
             category: req.query.category || 'All',
-            original: userData.map(d => ({ label: d.label, value: d.value, category: d.category })),
+            original: chartHistory(aiResponse, userData, d => ({ label: d.label, value: d.value, category: d.category })),
             predictions: aiResponse.predictions,
             model: aiResponse.model
         });
@@ -314,6 +367,34 @@ router.get('/predict', protect, async (req, res) => {
     }
 });
 
+// GET AI predictions for every category in a single engine call
+router.get('/predict/batch', protect, async (req, res) => {
+    try {
+        const userData = await Data.find({ user: req.user._id }).sort({ date: 1 });
+
+        // Group by category
+        const series = {};
+        userData.forEach(d => {
+            if (!series[d.category]) series[d.category] = [];
+            series[d.category].push({ value: d.value, label: d.label });
+        });
+
+        if (Object.keys(series).length === 0) {
+            return res.status(400).json({
+                message: 'Add some data first to make predictions.'
+            });
+        }
+
+        const payload = JSON.stringify({ series, model_key: String(req.user._id), ...forecastModel(req.query) });
+
+        const aiResponse = await callAIEngine('/predict/batch', payload);
+
+        res.json(aiResponse);
+    } catch (err) {
+        res.status(500).json({ message: err.message });
+    }
+});
+
 // GET AI insights for all categories
 router.get('/insights', protect, async (req, res) => {
     try {
@@ -332,7 +413,7 @@ router.get('/insights', protect, async (req, res) => {
             categories[d.category].push({ value: d.value, label: d.label, date: d.date });
         });
 
-        const payload = JSON.stringify({ categories });
+        const payload = JSON.stringify({ categories, ...forecastModel(req.query) });
 
         const aiResponse = await callAIEngine('/insights', payload);
 
@@ -342,6 +423,53 @@ router.get('/insights', protect, async (req, res) => {
     }
 });
 
+// GET the dashboard snapshot: insights, per-category forecasts and correlations in one call.
+// The AI engine keeps it versioned per user and only refits categories whose data changed.
+router.get('/snapshot', protect, async (req, res) => {
+    try {
+        const userData = await Data.find({ user: req.user._id }).sort({ date: 1 });
+
+        const categories = {};
+        userData.forEach(d => {
+            if (!categories[d.category]) categories[d.category] = { values: [] };
+            categories[d.category].values.push(d.value);
+        });
+
+        const payload = JSON.stringify({ categories });
+
+        const aiResponse = await callAIEngine(`/snapshots/${req.user._id}`, payload);
+
+        res.json(aiResponse);
+    } catch (err) {
+        res.status(500).json({ message: err.message });
+    }
+});
+
+// GET anomalies per category from rolling statistics (?window=&threshold=)
+router.get('/anomalies', protect, async (req, res) => {
+    try {
+        const userData = await Data.find({ user: req.user._id }).sort({ date: 1 });
+
+        const categories = {};
+        userData.forEach(d => {
+            if (!categories[d.category]) categories[d.category] = { values: [], labels: [] };
+            categories[d.category].values.push(d.value);
+            categories[d.category].labels.push(d.label);
+        });
+
+        const options = {};
+        if (req.query.window) options.window = parseInt(req.query.window, 10);
+        if (req.query.threshold) options.threshold = parseFloat(req.query.threshold);
+        const payload = JSON.stringify({ categories, ...options });
+
+        const aiResponse = await callAIEngine('/anomalies', payload);
+
+        res.json(aiResponse);
+    } catch (err) {
+        res.status(500).json({ message: err.message });
+    }
+});
+
 // GET cross-category correlations
 router.get('/correlations', protect, async (req, res) => {
     try {
@@ -360,7 +488,9 @@ router.get('/correlations', protect, async (req, res) => {
             categories[d.category].push({ value: d.value, label: d.label, date: d.date });
         });
 
-        const payload = JSON.stringify({ categories });
+        // ?max_lag=N also finds leading indicators up to N entries apart
+        const maxLag = parseInt(req.query.max_lag, 10);
+        const payload = JSON.stringify({ categories, ...(Number.isFinite(maxLag) ? { max_lag: maxLag } : {}) });
 
         const aiResponse = await callAIEngine('/correlations', payload);
 
@@ -411,12 +541,59 @@ router.post('/generate-report', protect, async (req, res) => {
     }
 });
 
-// GET What-If simulation with growth multiplier
+// POST Queue a PDF report for background rendering; returns { job_id, status }
+router.post('/reports', protect, async (req, res) => {
+    try {
+        const aiUrl = process.env.AI_ENGINE_URL || 'http://127.0.0.1:5001';
+        const response = await axios.post(`${aiUrl}/reports`, req.body, { timeout: 10000 });
+        res.status(response.status).json(response.data);
+    } catch (err) {
+        console.error("❌ Report Job Error:", err.message);
+        res.status(err.response?.status || 500).json(err.response?.data || { message: "Failed to queue report." });
+    }
+});
+
+// GET Report job status
+router.get('/reports/:jobId', protect, async (req, res) => {
+    try {
+        const aiUrl = process.env.AI_ENGINE_URL || 'http://127.0.0.1:5001';
+        const response = await axios.get(`${aiUrl}/reports/${encodeURIComponent(req.params.jobId)}`, { timeout: 10000 });
+        res.json(response.data);
+    } catch (err) {
+        res.status(err.response?.status || 500).json(err.response?.data || { message: err.message });
+    }
+});
+
+// GET Download a finished report
+router.get('/reports/:jobId/download', protect, async (req, res) => {
+    try {
+        const aiUrl = process.env.AI_ENGINE_URL || 'http://127.0.0.1:5001';
+        const response = await axios.get(`${aiUrl}/reports/${encodeURIComponent(req.params.jobId)}/download`, {
+            responseType: 'stream',
+            timeout: 30000,
+        });
+        res.setHeader('Content-Type', 'application/pdf');
+        res.setHeader('Content-Disposition', 'attachment; filename=smart_dash_report.pdf');
+        response.data.pipe(res);
+    } catch (err) {
+        res.status(err.response?.status || 500).json({ message: "Report is not available." });
+    }
+});
+
+// GET What-If simulation with growth multiplier.
+// Optional scenario grid: ?multipliers=0.5,0.55,...&horizons=6&draws=500 returns
+// every multiplier (with confidence bands when draws > 0) in one engine call.
 router.get('/simulate', protect, async (req, res) => {
     try {
         const filter = { user: req.user._id };
         if (req.query.category) filter.category = req.query.category;
         const multiplier = parseFloat(req.query.multiplier) || 1.0;
+        const grid = {};
+        if (req.query.multipliers) {
+            grid.multipliers = String(req.query.multipliers).split(',').map(Number).filter(Number.isFinite);
+        }
+        if (req.query.horizons) grid.horizons = parseInt(req.query.horizons, 10);
+        if (req.query.draws) grid.draws = parseInt(req.query.draws, 10);
 
         const userData = await Data.find(filter).sort({ date: 1 });
 
@@ -428,17 +605,21 @@ router.get('/simulate', protect, async (req, res) => {
 
         const payload = JSON.stringify({
             data: userData.map(d => ({ value: d.value, label: d.label })),
-            multiplier
+            multiplier,
+            ...grid,
+            ...forecastModel(req.query),
+            ...historyOptions(req.query)
         });
 
         const aiResponse = await callAIEngine('/simulate', payload);
 
         res.json({
             category: req.query.category || 'All',
-            original: userData.map(d => ({ label: d.label, value: d.value })),
+            original: chartHistory(aiResponse, userData, d => ({ label: d.label, value: d.value })),
             predictions: aiResponse.original,
             projected: aiResponse.projected,
             multiplier: aiResponse.multiplier,
+            scenarios: aiResponse.scenarios,
             model: aiResponse.model
         });
     } catch (err) {
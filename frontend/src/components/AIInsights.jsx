@@ -101,14 +101,13 @@ const AIInsights = ({ onClose }) => {
         setLoading(true);
         setError(null);
         try {
-            const [insightsRes, correlationsRes] = await Promise.all([
-                api.get('/data/insights').catch(e => ({ data: { insights: [], global_summary: null } })),
-                api.get('/data/correlations').catch(e => ({ data: { correlations: [] } }))
-            ]);
+            // One precomputed snapshot carries both insights and correlations
+            const snapshotRes = await api.get('/data/snapshot')
+                .catch(e => ({ data: { insights: [], global_summary: null, correlations: [] } }));
 
-            setInsights(insightsRes.data.insights || []);
-            setGlobalSummary(insightsRes.data.global_summary || null);
-            setCorrelations(correlationsRes.data.correlations || []);
+            setInsights(snapshotRes.data.insights || []);
+            setGlobalSummary(snapshotRes.data.global_summary || null);
+            setCorrelations(snapshotRes.data.correlations || []);
         } catch (err) {
             setError('Failed to load AI analytics.');
         } finally {
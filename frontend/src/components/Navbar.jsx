@@ -217,6 +217,7 @@ const Navbar = ({ onToggleSidebar, collapsed }) => {
                                     >
                                         <option value="lt">Below (&lt;)</option>
                                         <option value="gt">Above (&gt;)</option>
+                                        <option value="anomaly">Anomaly (|z| &ge;)</option>
                                     </select>
                                 </div>
                                 <div className="w-24">
@@ -248,7 +249,7 @@ const Navbar = ({ onToggleSidebar, collapsed }) => {
                                             </div>
                                             <div>
                                                 <p className="text-sm font-medium text-white">
-                                                    {alert.category} {alert.condition === 'gt' ? '>' : '<'} {alert.threshold}
+                                                    {alert.category} {alert.condition === 'anomaly' ? '|z| ≥' : alert.condition === 'gt' ? '>' : '<'} {alert.threshold}
                                                 </p>
                                                 <p className="text-xs text-slate-500">Active</p>
                                             </div>
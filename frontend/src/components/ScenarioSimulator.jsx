@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import api from '../services/api';
 import {
     AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer
@@ -6,13 +6,17 @@ import {
 import { Sliders, Target, Sparkles, Loader2 } from 'lucide-react';
 import confetti from 'canvas-confetti';
 
+// Slider range (0.5 .. 2.0 in 0.05 steps), fetched as one scenario grid per category
+const SLIDER_MULTIPLIERS = Array.from({ length: 31 }, (_, i) => Math.round((0.5 + i * 0.05) * 100) / 100);
+const BAND_DRAWS = 500;
+
 export default function ScenarioSimulator() {
     const [categories, setCategories] = useState([]);
     const [selectedCategory, setSelectedCategory] = useState('');
     const [multiplier, setMultiplier] = useState(1.0); // 1.0 = 0% change, 1.2 = +20%
     const [targetGoal, setTargetGoal] = useState('');
     const [loading, setLoading] = useState(false);
-    const [simulationData, setSimulationData] = useState(null);
+    const [scenarioData, setScenarioData] = useState(null);
     const [error, setError] = useState(null);
     const [hasCelebrated, setHasCelebrated] = useState(false);
 
@@ -24,65 +28,76 @@ export default function ScenarioSimulator() {
         });
     }, []);
 
-    // Run Simulation
+    // Fetch the whole slider range (with confidence bands) once per category
     useEffect(() => {
         if (!selectedCategory) return;
 
         const runSimulation = async () => {
             setLoading(true);
             try {
-                // Fetch simulation from backend
-                const res = await api.get(`/data/simulate?category=${selectedCategory}&multiplier=${multiplier}`);
-                setSimulationData(res.data);
+                const res = await api.get(
+                    `/data/simulate?category=${encodeURIComponent(selectedCategory)}` +
+                    `&multipliers=${SLIDER_MULTIPLIERS.join(',')}&horizons=6&draws=${BAND_DRAWS}`
+                );
+                setScenarioData(res.data);
                 setError(null);
             } catch (err) {
                 console.error(err);
                 const apiError = err.response?.data?.message || 'Failed to run simulation.';
                 setError(apiError);
-                setSimulationData(null);
+                setScenarioData(null);
             } finally {
                 setLoading(false);
             }
         };
 
-        // Debounce slider input
-        const timer = setTimeout(runSimulation, 500);
-        return () => clearTimeout(timer);
-    }, [selectedCategory, multiplier]);
+        runSimulation();
+    }, [selectedCategory]);
+
+    // Pick the slider position from the grid; multipliers outside it (e.g. from
+    // goal seeking) scale the baseline row, since projections are linear in it.
+    const simulationData = useMemo(() => {
+        if (!scenarioData || !scenarioData.scenarios) return scenarioData;
+        const { scenarios, predictions } = scenarioData;
+        const row = scenarios.multipliers.findIndex(m => Math.abs(m - multiplier) < 1e-9);
+        const base = scenarios.multipliers.indexOf(1);
+        const pick = (grid, i) => (row >= 0
+            ? grid[row][i]
+            : Math.round(grid[base][i] * multiplier * 100) / 100);
+        return {
+            ...scenarioData,
+            projected: predictions.map((p, i) => ({ ...p, value: pick(scenarios.projected, i) })),
+            bands: scenarios.lower
+                ? predictions.map((_, i) => [pick(scenarios.lower, i), pick(scenarios.upper, i)])
+                : null
+        };
+    }, [scenarioData, multiplier]);
 
     // Reset celebration when goal or category changes
     useEffect(() => {
         setHasCelebrated(false);
     }, [targetGoal, selectedCategory]);
 
-    // Track previous loading state to detect when a simulation finishes
-    const [prevLoading, setPrevLoading] = useState(false);
-
-    // Trigger Confetti when goal is reached via simulation
+    // Trigger Confetti when a simulated scenario reaches the goal
     useEffect(() => {
-        if (loading) {
-            setPrevLoading(true);
-            return;
-        }
+        if (loading || !simulationData || !targetGoal) return;
 
-        // Only check for celebration if we just finished loading
-        if (prevLoading && !loading && simulationData && targetGoal) {
-            const projectedValue = simulationData.projected && simulationData.projected[0] ? simulationData.projected[0].value : 0;
-            const goal = parseFloat(targetGoal);
+        const projectedValue = simulationData.projected && simulationData.projected[0] ? simulationData.projected[0].value : 0;
+        const goal = parseFloat(targetGoal);
 
-            // If goal met and haven't celebrated yet
-            if (projectedValue >= goal && !hasCelebrated && goal > 0) {
-                confetti({
-                    particleCount: 150,
-                    spread: 70,
-                    origin: { y: 0.6 },
-                    colors: ['#6366f1', '#22c55e', '#f59e0b', '#ffffff']
-                });
-                setHasCelebrated(true);
-            }
-            setPrevLoading(false);
+        // If goal met and haven't celebrated yet
+        if (projectedValue >= goal && !hasCelebrated && goal > 0) {
+            confetti({
+                particleCount: 150,
+                spread: 70,
+                origin: { y: 0.6 },
+                colors: ['#6366f1', '#22c55e', '#f59e0b', '#ffffff']
+            });
+            setHasCelebrated(true);
         }
-    }, [loading, simulationData, targetGoal, hasCelebrated, prevLoading]);
+        // Re-checked when the simulation changes, not while the goal is typed
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [loading, simulationData]);
 
     // calculate goal
     const calculateGoalRequirement = () => {
@@ -229,7 +244,8 @@ export default function ScenarioSimulator() {
                                         ...simulationData.predictions.map((p, i) => ({
                                             name: p.label,
                                             original: p.value,
-                                            projected: simulationData.projected[i].value
+                                            projected: simulationData.projected[i].value,
+                                            band: simulationData.bands ? simulationData.bands[i] : undefined
                                         }))
                                     ]}>
                                         <defs>
@@ -250,6 +266,7 @@ export default function ScenarioSimulator() {
                                             itemStyle={{ fontSize: 12 }}
                                         />
                                         <Area type="monotone" dataKey="original" stroke="#6366f1" strokeWidth={2} name="Baseline" fill="url(#splitColor)" />
+                                        <Area type="monotone" dataKey="band" stroke="none" name="90% range" fill="#22c55e" fillOpacity={0.12} />
                                         <Area type="monotone" dataKey="projected" stroke="#22c55e" strokeWidth={2} strokeDasharray="5 5" name="Simulated" fill="url(#projColor)" />
                                     </AreaChart>
                                 </ResponsiveContainer>